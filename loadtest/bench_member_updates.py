@@ -0,0 +1,241 @@
+"""CPU-Benchmark: GUILD_MEMBER_UPDATE-Ströme mit und ohne Performance-Profil
+
+Spielt einen aufgezeichneten bzw. synthetischen Strom komprimierter
+GUILD_MEMBER_UPDATE-Frames durch denselben Weg, den discord.py im Betrieb
+nimmt (Dekomprimieren -> JSON dekodieren -> ConnectionState-Parser ->
+on_member_update des RoleBot) und misst die CPU-Zeit pro Event.
+
+Verglichen werden zwei Läufe in getrennten Prozessen:
+    baseline     asyncio-Standardloop, json aus der Standardbibliothek, zlib-stream
+    performance  uvloop, orjson, zstd-stream (soweit installiert, siehe
+                 requirements-performance.txt)
+
+Beispiel:
+    python loadtest/bench_member_updates.py --events 20000 --members 2000
+    python loadtest/bench_member_updates.py --replay events.jsonl
+
+Mit --replay wird eine JSONL-Datei mit GUILD_MEMBER_UPDATE-Payloads (das
+'d'-Objekt je Zeile) statt des synthetischen Stroms abgespielt; die Mitglieder
+und Rollen daraus werden automatisch in der Fake-Guild angelegt.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+REPO_ROOT = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_discord import FakeDiscord
+
+ZLIB_SUFFIX = b'\x00\x00\xff\xff'
+
+class ZlibStream:
+    """Nachbau von discord.py's zlib-stream-Kontext (ohne zstandard nicht abschaltbar)"""
+
+    COMPRESSION_TYPE = 'zlib-stream'
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.context = zlib.decompressobj()
+
+    def decompress(self, data: bytes):
+        self.buffer.extend(data)
+        if len(data) < 4 or data[-4:] != ZLIB_SUFFIX:
+            return None
+        msg = self.context.decompress(self.buffer)
+        self.buffer = bytearray()
+        return msg.decode('utf-8')
+
+def compressor(compression: str):
+    """Liefert eine Funktion, die Frames so komprimiert wie das Discord-Gateway"""
+    if compression == 'zstd-stream':
+        import zstandard
+        stream = zstandard.ZstdCompressor().compressobj()
+        return lambda data: stream.compress(data) + stream.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+    stream = zlib.compressobj()
+    return lambda data: stream.compress(data) + stream.flush(zlib.Z_SYNC_FLUSH)
+
+def build_guild(args):
+    """Fake-Guild mit Parent-/Child-Verbindung, Rauschen-Rollen und Mitgliedern"""
+    fake = FakeDiscord()
+    parent_id = fake.add_role('Parent', position=50)
+    child_ids = [fake.add_role(f'Child {i}', position=10 + i) for i in range(args.children)]
+    noise_ids = [fake.add_role(f'Noise {i}', position=60 + i) for i in range(args.noise_roles)]
+    member_ids = [fake.add_member() for _ in range(args.members)]
+    config = {
+        'role_connections': {fake.guild_id: {parent_id: [int(c) for c in child_ids]}},
+        'log_channels': {},
+        'command_permissions': {}
+    }
+    return fake, noise_ids, member_ids, config
+
+def synthetic_stream(fake: FakeDiscord, noise_ids, member_ids, count: int, seed: int):
+    """Typischer Gateway-Verkehr: Rollen kommen und gehen, die Parent-Rolle bleibt unberührt"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        member = fake.members[rng.choice(member_ids)]
+        roles = set(member['roles'])
+        roles.symmetric_difference_update({rng.choice(noise_ids)})
+        member['roles'] = sorted(roles)
+        yield {'guild_id': fake.guild_id, **member}
+
+def replay_stream(fake: FakeDiscord, path: str):
+    """Liest aufgezeichnete Payloads und legt unbekannte Mitglieder/Rollen an"""
+    with open(path, 'r', encoding='utf-8') as f:
+        payloads = [json.loads(line) for line in f if line.strip()]
+    for payload in payloads:
+        for role_id in payload.get('roles', []):
+            if role_id not in fake.roles:
+                fake.add_role(f'Replay {role_id}', role_id=role_id)
+        if payload['user']['id'] not in fake.members:
+            fake.add_member(user=payload['user'], roles=payload.get('roles', []))
+        payload['guild_id'] = fake.guild_id
+    return payloads
+
+async def replay(args) -> dict:
+    import discord
+    import main  # nach chdir und Umgebungsvariablen importieren
+
+    if main.PERFORMANCE_PROFILE:
+        decompressor = discord.utils._ActiveDecompressionContext()
+        from_json = discord.utils._from_json
+    else:
+        decompressor = ZlibStream()
+        from_json = json.loads
+
+    fake, noise_ids, member_ids, _ = args.guild
+    if args.replay:
+        payloads = replay_stream(fake, args.replay)
+    else:
+        payloads = list(synthetic_stream(fake, noise_ids, member_ids, args.events, args.seed))
+
+    # ConnectionState so befüllen, als wären READY und GUILD_CREATE angekommen
+    bot = main.bot
+    await bot._async_setup_hook()  # Loop binden, ohne setup_hook/Login auszuführen
+    state = bot._connection
+    state.user = discord.ClientUser(state=state, data=fake.bot_user)
+    state._add_guild_from_data(fake.guild_payload())
+    parse = state.parsers['GUILD_MEMBER_UPDATE']
+
+    compress = compressor(decompressor.COMPRESSION_TYPE)
+    frames = [
+        compress(json.dumps({'op': 0, 't': 'GUILD_MEMBER_UPDATE', 's': i, 'd': payload}).encode())
+        for i, payload in enumerate(payloads, 1)
+    ]
+    wire_bytes = sum(len(frame) for frame in frames)
+
+    async def drain():
+        # Handler-Tasks des Batches laufen lassen
+        pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for i, frame in enumerate(frames, 1):
+        msg = decompressor.decompress(frame)
+        if msg is None:
+            continue
+        data = from_json(msg)
+        parse(data['d'])
+        if i % args.batch == 0:
+            await drain()
+    await drain()
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    return {
+        'mode': 'performance' if main.PERFORMANCE_PROFILE else 'baseline',
+        'status': main.performance_status() | {
+            'bench_json': 'orjson' if from_json is not json.loads else 'json',
+            'bench_compression': decompressor.COMPRESSION_TYPE
+        },
+        'events': len(frames),
+        'wire_bytes_per_event': round(wire_bytes / len(frames), 1) if frames else 0,
+        'cpu_s': round(cpu, 4),
+        'wall_s': round(wall, 4),
+        'cpu_us_per_event': round(cpu / len(frames) * 1e6, 2) if frames else 0
+    }
+
+def run_mode(args):
+    """Ein einzelner Lauf im aktuellen Prozess (wird vom Vergleich als Subprozess gestartet)"""
+    args.guild = build_guild(args)
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(workdir, 'config.json'), 'w', encoding='utf-8') as f:
+            json.dump(args.guild[3], f)
+        os.chdir(workdir)
+        sys.path.insert(0, REPO_ROOT)
+        import main
+        if main.PERFORMANCE_PROFILE:
+            main.install_uvloop()
+        result = asyncio.run(replay(args))
+        main.bot.history.close()
+        os.chdir(REPO_ROOT)
+    return result
+
+def compare(args) -> dict:
+    results = {}
+    for mode in ('baseline', 'performance'):
+        env = dict(os.environ, PERFORMANCE_PROFILE='1' if mode == 'performance' else '0')
+        cmd = [sys.executable, os.path.abspath(__file__), '--mode', mode,
+               '--events', str(args.events), '--members', str(args.members),
+               '--children', str(args.children), '--noise-roles', str(args.noise_roles),
+               '--batch', str(args.batch), '--seed', str(args.seed)]
+        if args.replay:
+            cmd += ['--replay', os.path.abspath(args.replay)]
+        runs = []
+        for _ in range(args.repeat):
+            out = subprocess.run(cmd, env=env, capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(out.strip().splitlines()[-1]))
+        # Bester Lauf zählt - Ausreißer durch andere Prozesse ignorieren
+        results[mode] = min(runs, key=lambda r: r['cpu_us_per_event'])
+    base = results['baseline']['cpu_us_per_event']
+    fast = results['performance']['cpu_us_per_event']
+    results['speedup'] = round(base / fast, 2) if fast else None
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="CPU pro GUILD_MEMBER_UPDATE mit und ohne Performance-Profil")
+    parser.add_argument('--events', type=int, default=20000, help="Anzahl synthetischer Events")
+    parser.add_argument('--members', type=int, default=2000, help="Mitglieder in der Fake-Guild")
+    parser.add_argument('--children', type=int, default=3, help="Child-Rollen der Parent-Rolle")
+    parser.add_argument('--noise-roles', type=int, default=20, help="Rollen, die im Strom vergeben/entfernt werden")
+    parser.add_argument('--batch', type=int, default=200, help="Events zwischen zwei Loop-Durchläufen")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3, help="Läufe pro Modus (bester zählt)")
+    parser.add_argument('--replay', help="JSONL-Datei mit aufgezeichneten GUILD_MEMBER_UPDATE-Payloads")
+    parser.add_argument('--mode', choices=('baseline', 'performance'), help=argparse.SUPPRESS)
+    parser.add_argument('--json', action='store_true', help="Ergebnis als JSON ausgeben")
+    return parser.parse_args()
+
+def print_report(results: dict):
+    print("=" * 40)
+    for mode in ('baseline', 'performance'):
+        r = results[mode]
+        status = r['status']
+        print(f"{mode}:")
+        print(f"  Loop:        {'uvloop' if status['uvloop'] else 'asyncio'}")
+        print(f"  JSON:        {status['bench_json']}")
+        print(f"  Kompression: {status['bench_compression']} ({r['wire_bytes_per_event']} Byte/Event)")
+        print(f"  CPU:         {r['cpu_us_per_event']} µs/Event ({r['events']} Events, {r['cpu_s']} s)")
+    print(f"Speedup:       {results['speedup']}x")
+    print("=" * 40)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.mode:
+        print(json.dumps(run_mode(args)))
+    else:
+        results = compare(args)
+        if args.json:
+            print(json.dumps(results, indent=2))
+        else:
+            print_report(results)
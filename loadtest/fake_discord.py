@@ -0,0 +1,420 @@
+"""Lokaler Ersatz für Discord-Gateway und REST-API für End-to-End-Lasttests
+
+Der Server spricht genug vom Gateway-Protokoll (HELLO, IDENTIFY, READY,
+GUILD_CREATE, Heartbeats, Member-Chunks) und von der REST-API, damit
+discord.py und damit der RoleBot unverändert dagegen laufen können.
+Der Bot wird über DISCORD_API_BASE und DISCORD_GATEWAY_URL umgeleitet.
+
+Skriptbar sind:
+    - GUILD_MEMBER_UPDATE-Stürme (member_update / role_storm)
+    - Slash-Command-Interaktionen (interaction)
+    - 429-Antworten (ratelimit_every) und künstliche Latenz (latency_ms / jitter_ms)
+    - API-Ausfälle mit 503 für Rollenänderungen (outage)
+
+Alle Rollenänderungen, Log-Nachrichten und Interaktions-Antworten des Bots
+werden mit Zeitstempel aufgezeichnet, damit Tests darauf prüfen können.
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from aiohttp import WSMsgType, web
+
+# Je eine Millisekunde Abstand: discord.py hasht Snowflakes über den Zeitstempel (id >> 22),
+# gleiche Millisekunden würden sonst in Sets/Dicts kollidieren
+_snowflakes = itertools.count(int(time.time() * 1000 - 1420070400000) << 22, 1 << 22)
+
+def snowflake() -> str:
+    return str(next(_snowflakes))
+
+def iso_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def json_response(data, status: int = 200, headers: Optional[dict] = None) -> web.Response:
+    """JSON-Antwort mit exakt 'application/json' - discord.py parst sonst nur Text"""
+    return web.Response(body=json.dumps(data).encode(), status=status,
+                        headers={'Content-Type': 'application/json', **(headers or {})})
+
+class FakeDiscord:
+    """Fake-Gateway und Fake-REST-API mit einer Guild im Speicher"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8765, latency_ms: float = 0,
+                 jitter_ms: float = 0, ratelimit_every: int = 0, retry_after: float = 0.05):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.ratelimit_every = ratelimit_every
+        self.retry_after = retry_after
+
+        self.bot_user = {'id': snowflake(), 'username': 'RoleBot', 'discriminator': '0',
+                         'global_name': None, 'avatar': None, 'bot': True}
+        self.application_id = snowflake()
+        self.guild_id = snowflake()
+        self.log_channel_id = snowflake()
+        self.roles: Dict[str, dict] = {}
+        self.members: Dict[str, dict] = {}
+
+        # Aufzeichnungen für Auswertung und Assertions
+        self.mutations: List[dict] = []  # {'t', 'member_id', 'role_id', 'op'}
+        self.messages: List[dict] = []  # {'t', 'channel_id' oder 'webhook_id', 'payload'}
+        self.interaction_responses: List[dict] = []  # {'t', 'interaction_id', 'payload'}
+        self.audit_log: List[dict] = []  # Einträge vom Typ MEMBER_ROLE_UPDATE, älteste zuerst
+        self.audit_log_requests = 0
+        self.unknown_routes: List[str] = []
+        self.rate_limited = 0
+        self.outage_responses = 0
+        self.requests = 0
+        self._outage_until = 0.0
+
+        self._sockets: List[web.WebSocketResponse] = []
+        self._seq = 0
+        self._ready = asyncio.Event()
+        self._runner: Optional[web.AppRunner] = None
+
+        self.add_role('@everyone', position=0, role_id=self.guild_id)
+        # Die Bot-Rolle liegt ganz oben, darf Rollen verwalten und das Audit-Log lesen
+        self.bot_role_id = self.add_role('RoleBot', position=1000, permissions=str(1 << 28 | 1 << 7))
+        self.add_member(self.bot_user, roles=[self.bot_role_id])
+
+    # ---------- Guild-Zustand ----------
+
+    @property
+    def api_base(self) -> str:
+        return f'http://{self.host}:{self.port}/api/v10'
+
+    @property
+    def gateway_url(self) -> str:
+        return f'ws://{self.host}:{self.port}/gateway'
+
+    def add_role(self, name: str, position: int = 1, permissions: str = '0',
+                 role_id: Optional[str] = None) -> str:
+        role_id = role_id or snowflake()
+        self.roles[role_id] = {
+            'id': role_id, 'name': name, 'color': 0, 'hoist': False, 'icon': None,
+            'unicode_emoji': None, 'position': position, 'permissions': permissions,
+            'managed': False, 'mentionable': False, 'flags': 0
+        }
+        return role_id
+
+    def add_member(self, user: Optional[dict] = None, roles: Optional[List[str]] = None) -> str:
+        if user is None:
+            user_id = snowflake()
+            user = {'id': user_id, 'username': f'user{user_id[-6:]}', 'discriminator': '0',
+                    'global_name': None, 'avatar': None}
+        self.members[user['id']] = {
+            'user': user, 'roles': list(roles or []), 'nick': None, 'avatar': None,
+            'joined_at': iso_now(), 'premium_since': None, 'deaf': False, 'mute': False,
+            'flags': 0, 'pending': False, 'communication_disabled_until': None
+        }
+        return user['id']
+
+    def member_roles(self, member_id: str) -> set:
+        return set(self.members[member_id]['roles'])
+
+    def guild_payload(self) -> dict:
+        return {
+            'id': self.guild_id, 'name': 'Lasttest', 'icon': None, 'splash': None,
+            'discovery_splash': None, 'owner_id': self.bot_user['id'], 'afk_channel_id': None,
+            'afk_timeout': 300, 'verification_level': 0, 'default_message_notifications': 0,
+            'explicit_content_filter': 0, 'roles': list(self.roles.values()), 'emojis': [],
+            'stickers': [], 'features': [], 'mfa_level': 0, 'system_channel_id': None,
+            'system_channel_flags': 0, 'rules_channel_id': None, 'vanity_url_code': None,
+            'description': None, 'banner': None, 'premium_tier': 0, 'preferred_locale': 'de',
+            'public_updates_channel_id': None, 'nsfw_level': 0, 'premium_progress_bar_enabled': False,
+            'unavailable': False, 'large': False, 'member_count': len(self.members),
+            'joined_at': iso_now(), 'voice_states': [], 'presences': [], 'threads': [],
+            'stage_instances': [], 'guild_scheduled_events': [], 'soundboard_sounds': [],
+            'members': list(self.members.values()),
+            'channels': [{
+                'id': self.log_channel_id, 'type': 0, 'name': 'role-logs', 'position': 0,
+                'permission_overwrites': [], 'nsfw': False, 'parent_id': None, 'topic': None,
+                'rate_limit_per_user': 0, 'last_message_id': None
+            }]
+        }
+
+    # ---------- Gateway ----------
+
+    async def dispatch(self, event: str, data: dict, target: Optional[web.WebSocketResponse] = None):
+        """Sendet ein Gateway-Event an alle verbundenen Bots (oder nur an `target`)"""
+        self._seq += 1
+        payload = json.dumps({'op': 0, 't': event, 's': self._seq, 'd': data})
+        for ws in [target] if target else list(self._sockets):
+            if not ws.closed:
+                await ws.send_str(payload)
+
+    async def _gateway(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        self._sockets.append(ws)
+        await ws.send_str(json.dumps({'op': 10, 'd': {'heartbeat_interval': 41250}}))
+
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            data = json.loads(msg.data)
+            op = data.get('op')
+
+            if op == 1:
+                await ws.send_str(json.dumps({'op': 11}))
+            elif op == 2:
+                await self.dispatch('READY', {
+                    'v': 10, 'user': self.bot_user, 'session_id': 'fake-session',
+                    'resume_gateway_url': self.gateway_url, 'shard': [0, 1],
+                    'application': {'id': self.application_id, 'flags': 0},
+                    'guilds': [{'id': self.guild_id, 'unavailable': True}]
+                }, target=ws)
+                await self.dispatch('GUILD_CREATE', self.guild_payload(), target=ws)
+                self._ready.set()
+            elif op == 6:
+                # Kein Resume - neu identifizieren lassen
+                await ws.send_str(json.dumps({'op': 9, 'd': False}))
+            elif op == 8:
+                await self.dispatch('GUILD_MEMBERS_CHUNK', {
+                    'guild_id': self.guild_id, 'members': list(self.members.values()),
+                    'chunk_index': 0, 'chunk_count': 1, 'nonce': data['d'].get('nonce')
+                }, target=ws)
+
+        self._sockets.remove(ws)
+        return ws
+
+    async def wait_until_connected(self, timeout: float = 30):
+        await asyncio.wait_for(self._ready.wait(), timeout)
+
+    # ---------- Skriptbare Szenarien ----------
+
+    def _record_audit(self, actor_id: str, member_id: str, old: List[str], new: List[str]):
+        """Protokolliert eine Rollenänderung wie Discords Audit-Log (MEMBER_ROLE_UPDATE)"""
+        changes = []
+        for key, role_ids in (('$add', set(new) - set(old)), ('$remove', set(old) - set(new))):
+            if role_ids:
+                changes.append({'key': key, 'new_value': [
+                    {'id': r, 'name': self.roles[r]['name'] if r in self.roles else r} for r in sorted(role_ids)
+                ]})
+        if changes:
+            self.audit_log.append({'id': snowflake(), 'user_id': actor_id, 'target_id': member_id,
+                                   'action_type': 25, 'changes': changes, 'options': None, 'reason': None})
+
+    async def member_update(self, member_id: str, roles: List[str], actor_id: Optional[str] = None) -> float:
+        """Setzt die Rollen eines Mitglieds und sendet GUILD_MEMBER_UPDATE; gibt den Sendezeitpunkt zurück
+
+        Mit `actor_id` landet die Änderung außerdem im Audit-Log.
+        """
+        member = self.members[member_id]
+        if actor_id:
+            self._record_audit(actor_id, member_id, member['roles'], roles)
+        member['roles'] = list(roles)
+        sent_at = time.perf_counter()
+        await self.dispatch('GUILD_MEMBER_UPDATE', {'guild_id': self.guild_id, **member})
+        return sent_at
+
+    async def role_storm(self, member_ids: List[str], role_id: str, rate: float,
+                         actor_id: Optional[str] = None) -> Dict[str, float]:
+        """Gibt allen Mitgliedern eine Rolle mit `rate` Events pro Sekunde; liefert member_id -> Sendezeit"""
+        sent = {}
+        interval = 1 / rate if rate else 0
+        start = time.perf_counter()
+        for i, member_id in enumerate(member_ids):
+            sent[member_id] = await self.member_update(member_id, self.members[member_id]['roles'] + [role_id],
+                                                       actor_id)
+            if interval:
+                delay = start + (i + 1) * interval - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        return sent
+
+    async def interaction(self, name: str, member_id: str, options: Optional[list] = None,
+                          resolved: Optional[dict] = None) -> str:
+        """Sendet einen Slash-Command als INTERACTION_CREATE; gibt die Interaktions-ID zurück"""
+        interaction_id = snowflake()
+        await self.dispatch('INTERACTION_CREATE', {
+            'id': interaction_id, 'application_id': self.application_id, 'type': 2,
+            'token': f'token-{interaction_id}', 'version': 1, 'guild_id': self.guild_id,
+            'channel_id': self.log_channel_id, 'member': {**self.members[member_id], 'permissions': '8'},
+            'app_permissions': '8', 'locale': 'de', 'guild_locale': 'de', 'entitlements': [],
+            'authorizing_integration_owners': {}, 'context': 0, 'attachment_size_limit': 10 * 1024 * 1024,
+            'data': {'id': snowflake(), 'name': name, 'type': 1, 'options': options or [],
+                     'resolved': resolved or {}}
+        })
+        return interaction_id
+
+    def outage(self, seconds: float):
+        """Beantwortet Rollenänderungen für `seconds` Sekunden mit 503"""
+        self._outage_until = time.perf_counter() + seconds
+
+    # ---------- REST ----------
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        self.requests += 1
+        if self.latency_ms or self.jitter_ms:
+            await asyncio.sleep((self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000)
+
+        mutating = request.method in ('PUT', 'PATCH', 'DELETE', 'POST')
+        if mutating and request.path.startswith('/api/v10/guilds') and time.perf_counter() < self._outage_until:
+            self.outage_responses += 1
+            return json_response({'message': 'Service Unavailable', 'code': 0}, status=503)
+        if (self.ratelimit_every and mutating and request.path.startswith('/api/v10/guilds')
+                and self.requests % self.ratelimit_every == 0):
+            self.rate_limited += 1
+            return json_response(
+                {'message': 'You are being rate limited.', 'retry_after': self.retry_after, 'global': False},
+                status=429,
+                # Ohne Via-Header hält discord.py die 429 für einen Cloudflare-Bann und wiederholt nicht
+                headers={'Retry-After': str(self.retry_after), 'X-RateLimit-Scope': 'user',
+                         'X-RateLimit-Bucket': 'fake', 'Via': '1.1 google'}
+            )
+        return await handler(request)
+
+    async def _users_me(self, request):
+        return json_response(self.bot_user)
+
+    async def _application(self, request):
+        return json_response({
+            'id': self.application_id, 'name': 'RoleBot', 'icon': None, 'description': '',
+            'bot_public': True, 'bot_require_code_grant': False, 'owner': self.bot_user,
+            'verify_key': '', 'flags': 0, 'team': None, 'summary': ''
+        })
+
+    async def _gateway_bot(self, request):
+        return json_response({
+            'url': self.gateway_url, 'shards': 1,
+            'session_start_limit': {'total': 1000, 'remaining': 1000, 'reset_after': 0, 'max_concurrency': 1}
+        })
+
+    async def _sync_commands(self, request):
+        commands = await request.json()
+        for command in commands:
+            command.setdefault('id', snowflake())
+            command.setdefault('application_id', self.application_id)
+            command.setdefault('version', snowflake())
+        return json_response(commands)
+
+    async def _member_role(self, request):
+        member_id = request.match_info['member_id']
+        role_id = request.match_info['role_id']
+        member = self.members.get(member_id)
+        if member is None or role_id not in self.roles:
+            return json_response({'message': 'Unknown', 'code': 10007}, status=404)
+
+        op = 'add' if request.method == 'PUT' else 'remove'
+        self.mutations.append({'t': time.perf_counter(), 'member_id': member_id, 'role_id': role_id, 'op': op})
+
+        # Wie Discord: die Änderung kommt als GUILD_MEMBER_UPDATE zurück (für Kaskaden)
+        roles = [r for r in member['roles'] if r != role_id]
+        if op == 'add':
+            roles.append(role_id)
+        asyncio.create_task(self.member_update(member_id, roles, self.bot_user['id']))
+        return web.Response(status=204)
+
+    async def _edit_member(self, request):
+        member_id = request.match_info['member_id']
+        member = self.members.get(member_id)
+        if member is None:
+            return json_response({'message': 'Unknown Member', 'code': 10007}, status=404)
+
+        payload = await request.json()
+        if 'roles' in payload:
+            old, new = set(member['roles']), set(payload['roles'])
+            now = time.perf_counter()
+            for role_id in new - old:
+                self.mutations.append({'t': now, 'member_id': member_id, 'role_id': role_id, 'op': 'add'})
+            for role_id in old - new:
+                self.mutations.append({'t': now, 'member_id': member_id, 'role_id': role_id, 'op': 'remove'})
+            asyncio.create_task(self.member_update(member_id, list(payload['roles']), self.bot_user['id']))
+        return json_response(member)
+
+    def _message(self, channel_id: str, payload: dict) -> dict:
+        return {
+            'id': snowflake(), 'channel_id': channel_id, 'author': self.bot_user,
+            'content': payload.get('content') or '', 'timestamp': iso_now(), 'edited_timestamp': None,
+            'tts': False, 'mention_everyone': False, 'mentions': [], 'mention_roles': [],
+            'attachments': [], 'embeds': payload.get('embeds') or [], 'pinned': False, 'type': 0,
+            'flags': 0, 'components': []
+        }
+
+    async def _channel_message(self, request):
+        channel_id = request.match_info['channel_id']
+        payload = await request.json()
+        self.messages.append({'t': time.perf_counter(), 'channel_id': channel_id, 'payload': payload})
+        return json_response(self._message(channel_id, payload))
+
+    async def _webhook_message(self, request):
+        payload = await request.json()
+        self.messages.append({'t': time.perf_counter(), 'webhook_id': request.match_info['webhook_id'],
+                              'payload': payload})
+        if request.query.get('wait') in ('1', 'true'):
+            # Follow-ups von Interaktionen erwarten die erstellte Nachricht
+            return json_response(self._message(self.log_channel_id, payload))
+        return web.Response(status=204)
+
+    async def _interaction_callback(self, request):
+        interaction_id = request.match_info['interaction_id']
+        payload = await request.json()
+        self.interaction_responses.append({'t': time.perf_counter(), 'interaction_id': interaction_id,
+                                           'payload': payload})
+        return json_response({
+            'interaction': {'id': interaction_id, 'type': 2, 'activity_instance_id': None,
+                            'response_message_id': None, 'response_message_loading': False,
+                            'response_message_ephemeral': True},
+            'resource': None
+        })
+
+    async def _audit_logs(self, request):
+        self.audit_log_requests += 1
+        query = request.query
+        entries = self.audit_log
+        if 'action_type' in query:
+            entries = [e for e in entries if e['action_type'] == int(query['action_type'])]
+        if 'user_id' in query:
+            entries = [e for e in entries if e['user_id'] == query['user_id']]
+        if 'before' in query:
+            entries = [e for e in entries if int(e['id']) < int(query['before'])]
+        limit = min(int(query.get('limit', 50)), 100)
+        if 'after' in query:
+            # Wie Discord: mit `after` aufsteigend ab dem Marker, sonst die neuesten zuerst
+            entries = [e for e in entries if int(e['id']) > int(query['after'])][:limit]
+        else:
+            entries = entries[::-1][:limit]
+        user_ids = {e['user_id'] for e in entries} | {e['target_id'] for e in entries}
+        users = [self.members[u]['user'] for u in user_ids if u in self.members]
+        return json_response({'audit_log_entries': entries, 'users': users, 'integrations': [],
+                                  'webhooks': [], 'guild_scheduled_events': [], 'threads': [],
+                                  'application_commands': [], 'auto_moderation_rules': []})
+
+    async def _unknown(self, request):
+        self.unknown_routes.append(f'{request.method} {request.path}')
+        return json_response({'message': 'Unknown route (fake)', 'code': 0}, status=404)
+
+    # ---------- Start/Stop ----------
+
+    async def start(self):
+        app = web.Application(middlewares=[self._middleware])
+        api = '/api/v10'
+        app.router.add_get('/gateway', self._gateway)
+        app.router.add_get(f'{api}/users/@me', self._users_me)
+        app.router.add_get(f'{api}/oauth2/applications/@me', self._application)
+        app.router.add_get(f'{api}/gateway/bot', self._gateway_bot)
+        app.router.add_put(f'{api}/applications/{{app_id}}/commands', self._sync_commands)
+        app.router.add_put(f'{api}/guilds/{{guild_id}}/members/{{member_id}}/roles/{{role_id}}', self._member_role)
+        app.router.add_delete(f'{api}/guilds/{{guild_id}}/members/{{member_id}}/roles/{{role_id}}', self._member_role)
+        app.router.add_patch(f'{api}/guilds/{{guild_id}}/members/{{member_id}}', self._edit_member)
+        app.router.add_get(f'{api}/guilds/{{guild_id}}/audit-logs', self._audit_logs)
+        app.router.add_post(f'{api}/channels/{{channel_id}}/messages', self._channel_message)
+        app.router.add_post(f'{api}/webhooks/{{webhook_id}}/{{token}}', self._webhook_message)
+        app.router.add_post(f'{api}/interactions/{{interaction_id}}/{{token}}/callback', self._interaction_callback)
+        app.router.add_route('*', '/{tail:.*}', self._unknown)
+
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self):
+        for ws in list(self._sockets):
+            await ws.close()
+        if self._runner:
+            await self._runner.cleanup()
@@ -0,0 +1,203 @@
+"""End-to-End-Lasttest des RoleBot gegen den lokalen Fake-Discord-Server
+
+Startet loadtest/fake_discord.py, leitet den Bot über DISCORD_API_BASE und
+DISCORD_GATEWAY_URL dorthin um und misst, wie schnell die Rollenverbindungen
+bei einem Sturm aus GUILD_MEMBER_UPDATE-Events umgesetzt werden.
+
+Beispiel:
+    python loadtest/run_loadtest.py --members 1000 --rate 500 --latency-ms 20 --ratelimit-every 50
+
+Der Bot läuft in einem temporären Verzeichnis mit eigener config.json, die
+bestehende Konfiguration wird nicht angefasst. Exit-Code 1, wenn nicht alle
+erwarteten Rollen vergeben wurden.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_discord import FakeDiscord
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="End-to-End-Lasttest gegen einen Fake-Discord-Server")
+    parser.add_argument('--members', type=int, default=500, help="Anzahl Mitglieder im Sturm")
+    parser.add_argument('--children', type=int, default=3, help="Child-Rollen pro Parent-Rolle")
+    parser.add_argument('--rate', type=float, default=250, help="GUILD_MEMBER_UPDATE-Events pro Sekunde (0 = so schnell wie möglich)")
+    parser.add_argument('--interactions', type=int, default=20, help="Anzahl /list_connections-Aufrufe")
+    parser.add_argument('--latency-ms', type=float, default=0, help="Künstliche REST-Latenz")
+    parser.add_argument('--jitter-ms', type=float, default=0, help="Zusätzliche zufällige REST-Latenz")
+    parser.add_argument('--ratelimit-every', type=int, default=0, help="Jede n-te Rollenänderung mit 429 beantworten")
+    parser.add_argument('--outage-s', type=float, default=0, help="Rollenänderungen zu Beginn des Sturms so lange mit 503 beantworten")
+    parser.add_argument('--timeout', type=float, default=120, help="Maximale Wartezeit auf alle Rollenänderungen")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--json', action='store_true', help="Report als JSON ausgeben")
+    return parser.parse_args()
+
+def build_guild(fake: FakeDiscord, args):
+    """Legt Parent-/Child-Rollen, einen Admin und die Test-Mitglieder an"""
+    parent_id = fake.add_role('Parent', position=50)
+    child_ids = [fake.add_role(f'Child {i}', position=10 + i) for i in range(args.children)]
+    admin_role_id = fake.add_role('Admin', position=100, permissions='8')
+    admin_id = fake.add_member(roles=[admin_role_id])
+    member_ids = [fake.add_member() for _ in range(args.members)]
+
+    config = {
+        'role_connections': {fake.guild_id: {parent_id: [int(c) for c in child_ids]}},
+        'log_channels': {fake.guild_id: int(fake.log_channel_id)},
+        'command_permissions': {},
+        # Gemessen wird der Command selbst, nicht das Throttling
+        'throttles': {fake.guild_id: {'list_connections': {'user': [0, 1], 'guild': [0, 1]}}}
+    }
+    return parent_id, child_ids, admin_id, member_ids, config
+
+async def wait_for_children(fake: FakeDiscord, member_ids, child_ids, timeout: float) -> bool:
+    expected = set(child_ids)
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if all(expected <= fake.member_roles(m) for m in member_ids):
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+async def run(args, workdir: str) -> dict:
+    fake = FakeDiscord(port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                       ratelimit_every=args.ratelimit_every)
+    parent_id, child_ids, admin_id, member_ids, config = build_guild(fake, args)
+
+    with open(os.path.join(workdir, 'config.json'), 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+
+    os.environ['DISCORD_API_BASE'] = fake.api_base
+    os.environ['DISCORD_GATEWAY_URL'] = fake.gateway_url
+    os.chdir(workdir)
+    import main  # erst nach Umgebungsvariablen und chdir importieren
+
+    await fake.start()
+    bot_task = asyncio.create_task(main.bot.start('fake-token'))
+    ready_task = asyncio.create_task(main.bot.wait_until_ready())
+    await asyncio.wait({bot_task, ready_task}, timeout=60, return_when=asyncio.FIRST_COMPLETED)
+    if bot_task.done():
+        # Bot ist beim Start abgestürzt - Fehler direkt anzeigen
+        await fake.stop()
+        bot_task.result()
+    if not ready_task.done():
+        raise TimeoutError("Bot wurde gegen den Fake-Server nicht bereit")
+
+    # 1. Sturm aus Rollenänderungen
+    storm_start = time.perf_counter()
+    if args.outage_s:
+        fake.outage(args.outage_s)
+    # Der Admin vergibt die Parent-Rolle - die Logs sollen ihn als Moderator nennen
+    sent = await fake.role_storm(member_ids, parent_id, args.rate, actor_id=admin_id)
+    complete = await wait_for_children(fake, member_ids, child_ids, args.timeout)
+    storm_duration = time.perf_counter() - storm_start
+    # Logs laufen im Hintergrund und warten auf das Audit-Log-Fenster
+    await asyncio.sleep(main.bot.attributor.window + 1 if main.bot.attributor else 0.5)
+
+    last_mutation = {}
+    child_set = set(child_ids)
+    for mutation in fake.mutations:
+        if mutation['op'] == 'add' and mutation['role_id'] in child_set:
+            last_mutation[mutation['member_id']] = mutation['t']
+    latencies = [(last_mutation[m] - sent[m]) * 1000 for m in member_ids if m in last_mutation]
+
+    # 2. Slash-Commands während normaler Last
+    interaction_sent = {}
+    for _ in range(args.interactions):
+        interaction_id = await fake.interaction('list_connections', admin_id)
+        interaction_sent[interaction_id] = time.perf_counter()
+    deadline = time.perf_counter() + 10
+    while len(fake.interaction_responses) < args.interactions and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    interaction_latencies = [
+        (r['t'] - interaction_sent[r['interaction_id']]) * 1000
+        for r in fake.interaction_responses if r['interaction_id'] in interaction_sent
+    ]
+
+    await main.bot.close()
+    bot_task.cancel()
+    await fake.stop()
+
+    role_adds = sum(1 for m in fake.mutations if m['op'] == 'add' and m['role_id'] in child_set)
+    attributed = sum(
+        1 for m in fake.messages
+        if any(field['name'].endswith('Moderator') and admin_id in field['value']
+               for embed in m['payload'].get('embeds', []) for field in embed.get('fields', []))
+    )
+    return {
+        'complete': complete,
+        'members': len(member_ids),
+        'members_synced': sum(1 for m in member_ids if child_set <= fake.member_roles(m)),
+        'events_sent': len(sent),
+        'role_mutations': role_adds,
+        'log_messages': len(fake.messages),
+        'log_messages_attributed': attributed,
+        'audit_log_requests': fake.audit_log_requests,
+        'rate_limited_responses': fake.rate_limited,
+        'outage_responses': fake.outage_responses,
+        'duration_s': round(storm_duration, 3),
+        'throughput_members_per_s': round(len(latencies) / storm_duration, 1) if storm_duration else 0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 1),
+            'p95': round(percentile(latencies, 95), 1),
+            'p99': round(percentile(latencies, 99), 1),
+            'max': round(max(latencies), 1) if latencies else 0,
+            'mean': round(statistics.mean(latencies), 1) if latencies else 0
+        },
+        'interactions': {
+            'sent': args.interactions,
+            'answered': len(interaction_latencies),
+            'p50_ms': round(percentile(interaction_latencies, 50), 1),
+            'p99_ms': round(percentile(interaction_latencies, 99), 1)
+        },
+        'unknown_routes': sorted(set(fake.unknown_routes))
+    }
+
+def print_report(report: dict):
+    print("=" * 40)
+    print(f"Mitglieder synchronisiert: {report['members_synced']}/{report['members']}")
+    print(f"Rollenänderungen:          {report['role_mutations']}")
+    print(f"Log-Nachrichten:           {report['log_messages']} "
+          f"({report['log_messages_attributed']} mit Moderator, {report['audit_log_requests']} Audit-Log-Abrufe)")
+    print(f"429-Antworten:             {report['rate_limited_responses']}")
+    print(f"503-Antworten (Ausfall):   {report['outage_responses']}")
+    print(f"Dauer:                     {report['duration_s']} s")
+    print(f"Durchsatz:                 {report['throughput_members_per_s']} Mitglieder/s")
+    latency = report['latency_ms']
+    print(f"Latenz (ms):               p50 {latency['p50']} | p95 {latency['p95']} | "
+          f"p99 {latency['p99']} | max {latency['max']}")
+    interactions = report['interactions']
+    print(f"Interaktionen:             {interactions['answered']}/{interactions['sent']} beantwortet, "
+          f"p50 {interactions['p50_ms']} ms, p99 {interactions['p99_ms']} ms")
+    if report['unknown_routes']:
+        print(f"Unbekannte Routen:         {', '.join(report['unknown_routes'])}")
+    print("=" * 40)
+
+if __name__ == "__main__":
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        report = asyncio.run(run(args, workdir))
+        os.chdir(REPO_ROOT)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    ok = report['complete'] and report['interactions']['answered'] == args.interactions
+    sys.exit(0 if ok else 1)
@@ -1,13 +1,49 @@
+import sys
+import time
+
+# Startzeitpunkt für den Startup-Report - muss vor allen anderen Imports stehen
+STARTUP_T0 = time.perf_counter()
+IMPORT_TIMINGS = {}
+PROFILE_STARTUP = '--profile-startup' in sys.argv
+
+if PROFILE_STARTUP:
+    # cProfile läuft bis on_ready; die schweren Imports werden einzeln gemessen
+    import cProfile
+    import importlib
+    startup_profiler = cProfile.Profile()
+    startup_profiler.enable()
+    for _module in ('discord', 'flask', 'dotenv'):
+        _start = time.perf_counter()
+        importlib.import_module(_module)
+        IMPORT_TIMINGS[_module] = round((time.perf_counter() - _start) * 1000, 1)
+
 import discord
 from discord import app_commands
 from discord.ext import commands
+import aiohttp
+import asyncio
+import concurrent.futures
+import csv
+import heapq
+import io
 import json
 import logging
-from datetime import datetime
-from typing import Optional, List
+import math
+import pstats
+import random
+import re
+import socket
+import sqlite3
+import threading
+import traceback
+from collections import Counter, OrderedDict, deque
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional, List, Tuple
 import os
 from dotenv import load_dotenv
-from flask import Flask
+from flask import Flask, jsonify
 from threading import Thread
 
 # Flask-App für Render Keep-Alive
@@ -17,8 +53,32 @@ app = Flask('')
 def home():
     return "Bot is running!"
 
+@app.route('/startup')
+def startup():
+    return jsonify(startup_timer.as_dict())
+
+@app.route('/metrics')
+def metrics():
+    # Im Event-Loop sammeln - dort werden Breaker, Zähler und Caches verändert
+    future = concurrent.futures.Future()
+
+    def collect():
+        try:
+            future.set_result(bot.get_metrics())
+        except Exception as e:
+            future.set_exception(e)
+
+    try:
+        bot.loop.call_soon_threadsafe(collect)
+    except (AttributeError, RuntimeError):
+        return jsonify({'status': 'Bot startet noch'}), 503
+    try:
+        return jsonify(future.result(timeout=5))
+    except concurrent.futures.TimeoutError:
+        return jsonify({'status': 'Event-Loop antwortet nicht', 'last_lag_ms': bot.loop_monitor.last_lag_ms}), 503
+
 def run():
-    app.run(host='0.0.0.0', port=8080)
+    app.run(host='0.0.0.0', port=int(os.getenv('PORT', '8080')))
 
 def keep_alive():
     t = Thread(target=run)
@@ -27,6 +87,60 @@ def keep_alive():
 # Lade Umgebungsvariablen
 load_dotenv()
 
+# Alternative Discord-Endpunkte, z.B. für Lasttests gegen loadtest/fake_discord.py
+if os.getenv('DISCORD_API_BASE'):
+    discord.http.Route.BASE = os.getenv('DISCORD_API_BASE').rstrip('/')
+if os.getenv('DISCORD_GATEWAY_URL'):
+    import yarl
+    discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(os.getenv('DISCORD_GATEWAY_URL'))
+
+# Opt-in Performance-Profil (--performance oder PERFORMANCE_PROFILE=1):
+# uvloop als Event-Loop und orjson für Konfiguration und eigene Serialisierung.
+# Gateway-Dekodierung (orjson) und zstd-Kompression aktiviert discord.py selbst,
+# sobald die Pakete aus requirements-performance.txt installiert sind.
+PERFORMANCE_PROFILE = '--performance' in sys.argv or os.getenv('PERFORMANCE_PROFILE', '').lower() in ('1', 'true', 'yes')
+
+orjson = None
+if PERFORMANCE_PROFILE:
+    try:
+        import orjson
+    except ImportError:
+        orjson = None
+
+def json_dumps(obj, indent: bool = False) -> str:
+    """Serialisiert nach JSON - mit orjson im Performance-Profil, sonst mit der Standardbibliothek"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode('utf-8')
+    return json.dumps(obj, indent=4 if indent else None, ensure_ascii=False)
+
+def json_loads(data):
+    """Gegenstück zu json_dumps"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def install_uvloop() -> bool:
+    """Setzt uvloop als Event-Loop-Policy, falls installiert (nicht unter Windows verfügbar)"""
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+def performance_status() -> dict:
+    """Welche Beschleunigungen tatsächlich aktiv sind"""
+    loop_policy = type(asyncio.get_event_loop_policy()).__module__
+    return {
+        'profile': PERFORMANCE_PROFILE,
+        'uvloop': loop_policy.startswith('uvloop'),
+        'orjson_config': orjson is not None,
+        'orjson_gateway': getattr(discord.utils, 'HAS_ORJSON', False),
+        # Ältere discord.py-Versionen ohne zstd-Unterstützung kennen nur zlib-stream
+        'gateway_compression': getattr(getattr(discord.utils, '_ActiveDecompressionContext', None),
+                                       'COMPRESSION_TYPE', 'zlib-stream')
+    }
+
 # Logging-Konfiguration
 logging.basicConfig(
     level=logging.INFO,
@@ -38,6 +152,1160 @@ logging.basicConfig(
 )
 logger = logging.getLogger('RoleBot')
 
+# Name des Webhooks, den der Bot für die Log-Zustellung anlegt bzw. wiederverwendet
+LOG_WEBHOOK_NAME = "Custom Roles Logs"
+
+class StartupTimer:
+    """Misst die Dauer der einzelnen Startphasen bis zum ersten on_ready"""
+
+    def __init__(self, t0: float):
+        self.t0 = t0
+        self.phases = {}
+        self._open = {}
+        self.report = None
+
+    def begin(self, name: str):
+        self._open[name] = time.perf_counter()
+
+    def is_running(self, name: str) -> bool:
+        return name in self._open
+
+    def end(self, name: str):
+        start = self._open.pop(name, None)
+        if start is not None:
+            self.phases[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    @contextmanager
+    def phase(self, name: str):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def finish(self, **extra) -> dict:
+        """Schließt den Report ab und loggt ihn als eine strukturierte Zeile"""
+        self.report = {
+            'total_ms': round((time.perf_counter() - self.t0) * 1000, 1),
+            'phases_ms': dict(self.phases),
+            'slowest_phase': max(self.phases, key=self.phases.get) if self.phases else None,
+            **extra
+        }
+        if IMPORT_TIMINGS:
+            self.report['imports_ms'] = dict(IMPORT_TIMINGS)
+        logger.info(f"Startup-Report: {json_dumps(self.report)}")
+        return self.report
+
+    def as_dict(self) -> dict:
+        if self.report:
+            return {'status': 'ready', **self.report}
+        return {
+            'status': 'starting',
+            'elapsed_ms': round((time.perf_counter() - self.t0) * 1000, 1),
+            'phases_ms': dict(self.phases),
+            'running': list(self._open)
+        }
+
+startup_timer = StartupTimer(STARTUP_T0)
+startup_timer.phases['imports'] = round((time.perf_counter() - STARTUP_T0) * 1000, 1)
+
+class LoopMonitor:
+    """Misst die Verzögerung des Event-Loops und erkennt Handler, die ihn blockieren"""
+
+    def __init__(self, threshold_ms: float = 100, interval: float = 0.25, sample_stack: bool = False,
+                 handler_names=None):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval
+        self.sample_stack = sample_stack
+        # Liefert die Namen der Event-Handler und Commands, nach denen im Stack gesucht wird
+        self.handler_names = handler_names or (lambda: set())
+
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.slow_count = 0
+        self.recent = deque(maxlen=20)
+
+        self._heartbeat = time.perf_counter()
+        self._loop_thread_id = None
+        self._incident = None
+        self._task: Optional[asyncio.Task] = None
+        self._handler_names = frozenset()
+
+    def start(self):
+        """Startet Mess-Task und Watchdog-Thread (muss im Event-Loop aufgerufen werden)"""
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.perf_counter()
+        # Einmal im Loop-Thread ermitteln - der Watchdog darf Bot und Command-Tree nicht selbst durchlaufen
+        self._handler_names = frozenset(self.handler_names())
+        # Referenz halten, sonst kann der Task vom Garbage Collector eingesammelt werden
+        self._task = asyncio.create_task(self._probe())
+        Thread(target=self._watchdog, name='loop-watchdog', daemon=True).start()
+
+    async def _probe(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self._heartbeat = now
+
+            lag = max(0.0, now - start - self.interval)
+            self.last_lag_ms = round(lag * 1000, 1)
+            self.max_lag_ms = max(self.max_lag_ms, self.last_lag_ms)
+
+            incident, self._incident = self._incident, None
+            if lag >= self.threshold:
+                self._report(lag, incident)
+
+    def _watchdog(self):
+        """Läuft in eigenem Thread und macht eine Stack-Probe, solange der Loop hängt"""
+        while True:
+            time.sleep(self.threshold / 2)
+            try:
+                self._sample()
+            except Exception as e:
+                # Der Watchdog darf nie still sterben
+                logger.error(f"Loop-Watchdog: Stack-Probe fehlgeschlagen: {e}")
+
+    def _sample(self):
+        heartbeat = self._heartbeat
+        stalled = time.perf_counter() - heartbeat - self.interval
+        if stalled < self.threshold or self._incident is not None:
+            return
+
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+
+        stack = traceback.extract_stack(frame)
+        handler = next((f.name for f in stack if f.name in self._handler_names), None)
+        self._incident = {
+            'handler': handler,
+            'location': f"{os.path.basename(stack[-1].filename)}:{stack[-1].lineno} ({stack[-1].name})",
+            'stack': ''.join(traceback.format_list(stack[-15:])) if self.sample_stack else None
+        }
+
+    def _report(self, lag: float, incident: Optional[dict]):
+        self.slow_count += 1
+        entry = {
+            'time': datetime.utcnow().isoformat(timespec='seconds'),
+            'lag_ms': round(lag * 1000, 1),
+            'handler': incident['handler'] if incident else None,
+            'location': incident['location'] if incident else None
+        }
+        self.recent.append(entry)
+
+        message = f"Event-Loop {entry['lag_ms']} ms blockiert (Handler: {entry['handler'] or 'unbekannt'}"
+        if entry['location']:
+            message += f", Stelle: {entry['location']}"
+        message += ")"
+        if incident and incident['stack']:
+            message += f"\n{incident['stack']}"
+        logger.warning(message)
+
+    def snapshot(self) -> dict:
+        return {
+            'last_lag_ms': self.last_lag_ms,
+            'max_lag_ms': self.max_lag_ms,
+            'threshold_ms': round(self.threshold * 1000, 1),
+            'slow_callbacks': self.slow_count,
+            'recent': list(self.recent)
+        }
+
+class AuditHistory:
+    """Append-only Verlauf aller Rollenaktionen in SQLite, indiziert nach Mitglied, Rolle und Zeit
+
+    Einträge werden im Speicher gepuffert und von einem Hintergrund-Task gebündelt
+    in einem Thread geschrieben, damit der Event-Loop nie auf die Festplatte wartet.
+    """
+
+    def __init__(self, path: str = 'history.db', retention_days: int = 180,
+                 flush_interval: float = 2.0, compact_interval: float = 6 * 3600):
+        self.path = path
+        self.retention_days = retention_days
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self._buffer = []
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # Muss vor dem Anlegen der Tabellen stehen; bestehende Dateien ohne auto_vacuum
+        # verwenden freie Seiten einfach wieder
+        self._db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY,
+                guild_id INTEGER NOT NULL,
+                member_id INTEGER NOT NULL,
+                role_id INTEGER,
+                action TEXT NOT NULL,
+                moderator_id INTEGER,
+                ts REAL NOT NULL,
+                details TEXT
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_history_member ON history (guild_id, member_id, ts)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_history_role ON history (guild_id, role_id, ts)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_history_time ON history (guild_id, ts)")
+        self._db.commit()
+
+    def record(self, guild_id: int, member_id: int, role_ids: List[int], action: str,
+               moderator_id: Optional[int] = None, details: Optional[str] = None):
+        """Merkt einen Eintrag pro Rolle vor (blockiert nicht)"""
+        ts = time.time()
+        for role_id in role_ids or [None]:
+            self._buffer.append((guild_id, member_id, role_id, action, moderator_id, ts, details))
+
+    def _write(self, rows: list):
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO history (guild_id, member_id, role_id, action, moderator_id, ts, details) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._db.commit()
+
+    def flush_sync(self):
+        rows, self._buffer = self._buffer, []
+        if rows:
+            try:
+                self._write(rows)
+            except Exception:
+                self._buffer[:0] = rows  # beim nächsten Flush erneut versuchen
+                raise
+
+    async def flush(self):
+        rows, self._buffer = self._buffer, []
+        if rows:
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except Exception:
+                self._buffer[:0] = rows  # beim nächsten Flush erneut versuchen
+                raise
+
+    def _compact(self, batch_size: int = 5000, vacuum_pages: int = 1000) -> int:
+        """Löscht Einträge außerhalb der Aufbewahrungszeit und gibt freie Seiten schrittweise frei
+
+        Gelöscht wird in Blöcken, damit der Lock zwischendurch frei wird und /history
+        sowie gepufferte Schreibvorgänge nicht auf die gesamte Aufräumarbeit warten.
+        """
+        cutoff = time.time() - self.retention_days * 86400
+        deleted = 0
+        while True:
+            with self._lock:
+                count = self._db.execute(
+                    "DELETE FROM history WHERE id IN (SELECT id FROM history WHERE ts < ? LIMIT ?)",
+                    (cutoff, batch_size)
+                ).rowcount
+                self._db.commit()
+                if count:
+                    self._db.execute(f"PRAGMA incremental_vacuum({vacuum_pages})").fetchall()
+            deleted += count
+            if count < batch_size:
+                return deleted
+
+    async def run(self):
+        """Hintergrund-Task: regelmäßig schreiben und alte Einträge aufräumen"""
+        last_compaction = 0.0
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if time.time() - last_compaction >= self.compact_interval:
+                    last_compaction = time.time()
+                    deleted = await asyncio.to_thread(self._compact)
+                    if deleted:
+                        logger.info(f"Verlauf kompaktiert: {deleted} alte Einträge entfernt")
+            except Exception as e:
+                logger.error(f"Fehler beim Schreiben des Verlaufs: {e}")
+
+    def _query(self, guild_id: int, member_id: Optional[int], role_id: Optional[int],
+               limit: int, offset: int):
+        where = ["guild_id = ?"]
+        params = [guild_id]
+        if member_id is not None:
+            where.append("member_id = ?")
+            params.append(member_id)
+        if role_id is not None:
+            where.append("role_id = ?")
+            params.append(role_id)
+        clause = " AND ".join(where)
+
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM history WHERE {clause}", params).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT member_id, role_id, action, moderator_id, ts, details FROM history "
+                f"WHERE {clause} ORDER BY ts DESC, id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return rows, total
+
+    async def query(self, guild_id: int, member_id: Optional[int] = None, role_id: Optional[int] = None,
+                    limit: int = 10, offset: int = 0):
+        """Liefert (Einträge, Gesamtanzahl), neueste zuerst"""
+        await self.flush()
+        return await asyncio.to_thread(self._query, guild_id, member_id, role_id, limit, offset)
+
+    def close(self):
+        self.flush_sync()
+        with self._lock:
+            self._db.close()
+
+def is_transient_error(error: Exception) -> bool:
+    """Fehler, bei denen sich ein späterer Versuch lohnt (5xx, 429, Timeouts, Verbindungsabbrüche)"""
+    if isinstance(error, discord.HTTPException):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (asyncio.TimeoutError, aiohttp.ClientError, OSError))
+
+class CircuitBreaker:
+    """Pausiert automatische Rollenänderungen einer Guild, solange die API wiederholt ausfällt"""
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        if self.state == 'closed':
+            return True
+        if self.state == 'open' and time.time() - self.opened_at >= self.cooldown:
+            # Ein einzelner Testversuch entscheidet, ob die API wieder erreichbar ist
+            self.state = 'half_open'
+            return True
+        return False
+
+    def reopens_at(self) -> float:
+        return self.opened_at + self.cooldown
+
+    def release_probe(self):
+        """Testversuch wurde nicht gebraucht - der nächste Aufruf darf erneut testen"""
+        if self.state == 'half_open':
+            self.state = 'open'
+
+    def record_success(self):
+        self.state = 'closed'
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == 'half_open' or self.failures >= self.threshold:
+            if self.state != 'open':
+                logger.warning(f"Circuit Breaker geöffnet nach {self.failures} Fehlern - Pause für {self.cooldown}s")
+            self.state = 'open'
+            self.opened_at = time.time()
+
+# Standard-Limits (Aufrufe, Sekunden), solange eine Guild per /set_throttle nichts anderes festlegt.
+# '*' gilt für alle Commands ohne eigenen Eintrag; Listen-Commands bauen große Embeds und sind strenger.
+DEFAULT_THROTTLES = {
+    '*': {'user': [10, 60], 'guild': [60, 60]},
+    'config': {'user': [3, 30], 'guild': [15, 60]},
+    'list_connections': {'user': [3, 30], 'guild': [15, 60]},
+    'list_rules': {'user': [3, 30], 'guild': [15, 60]},
+    'list_command_permissions': {'user': [3, 30], 'guild': [15, 60]},
+    'history': {'user': [5, 30], 'guild': [30, 60]}
+}
+THROTTLE_SCOPES = {'user': "Pro Benutzer", 'guild': "Pro Server"}
+# Nie gedrosselt - sonst könnte ein zu strenges Limit das eigene Aufheben blockieren
+THROTTLE_EXEMPT = frozenset({'set_throttle'})
+
+class TokenBucket:
+    """Token-Bucket: `capacity` Aufrufe am Stück, danach einer alle per/capacity Sekunden"""
+
+    __slots__ = ('capacity', 'per', 'tokens', 'updated')
+
+    def __init__(self, capacity: int, per: float):
+        self.capacity = capacity
+        self.per = per
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / self.per)
+        self.updated = now
+
+    def retry_after(self) -> float:
+        """Wartezeit bis zum nächsten freien Token (0 wenn sofort verfügbar)"""
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) * self.per / self.capacity
+
+    def is_idle(self, now: float) -> bool:
+        return now - self.updated >= self.per
+
+class CommandThrottle:
+    """Token-Buckets pro Benutzer und pro Guild je Command, geprüft vor jedem Slash-Command"""
+
+    def __init__(self, prune_interval: float = 300):
+        self._buckets = {}  # (scope, guild_id, user_id, command) -> TokenBucket
+        self.rejected = Counter()  # command -> abgelehnte Aufrufe
+        self.prune_interval = prune_interval
+        self._last_prune = time.monotonic()
+
+    @staticmethod
+    def limits_for(guild_throttles: dict, command_name: str) -> dict:
+        """Effektive Limits: Guild-Command > Guild-'*' > Standard-Command > Standard-'*'"""
+        limits = {}
+        for source in (DEFAULT_THROTTLES.get('*', {}), DEFAULT_THROTTLES.get(command_name, {}),
+                       guild_throttles.get('*', {}), guild_throttles.get(command_name, {})):
+            limits.update(source)
+        # [0, x] schaltet das Limit ab
+        return {scope: limit for scope, limit in limits.items() if limit and limit[0] > 0}
+
+    def _bucket(self, key: tuple, limit: list) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None or (bucket.capacity, bucket.per) != (limit[0], limit[1]):
+            bucket = self._buckets[key] = TokenBucket(limit[0], limit[1])
+        return bucket
+
+    def check(self, guild_id: str, user_id: int, command_name: str, guild_throttles: dict) -> float:
+        """Verbraucht je ein Token aus Benutzer- und Guild-Bucket; liefert sonst die Wartezeit"""
+        now = time.monotonic()
+        if now - self._last_prune >= self.prune_interval:
+            self.prune(now)
+
+        buckets = []
+        for scope, limit in self.limits_for(guild_throttles, command_name).items():
+            key = (scope, guild_id, user_id if scope == 'user' else None, command_name)
+            bucket = self._bucket(key, limit)
+            bucket.refill(now)
+            buckets.append(bucket)
+
+        # Erst alle prüfen, dann abbuchen - ein abgelehnter Aufruf kostet kein Token
+        wait = max((bucket.retry_after() for bucket in buckets), default=0.0)
+        if wait > 0:
+            self.rejected[command_name] += 1
+            return wait
+        for bucket in buckets:
+            bucket.tokens -= 1
+        return 0.0
+
+    def prune(self, now: float):
+        """Entfernt wieder volle Buckets, damit der Speicher nicht mit jedem Benutzer wächst"""
+        for key in [k for k, b in self._buckets.items() if b.is_idle(now)]:
+            del self._buckets[key]
+        self._last_prune = now
+
+    def reset(self, guild_id: str, command_name: str):
+        """Verwirft die Buckets eines Commands nach einer Limit-Änderung"""
+        for key in [k for k in self._buckets if k[1] == guild_id and command_name in ('*', k[3])]:
+            del self._buckets[key]
+
+class AuditAttributor:
+    """Ermittelt über das Audit-Log, wer eine Rollenänderung ausgelöst hat
+
+    Anfragen einer Guild werden `window` Sekunden gesammelt und mit einem Abruf
+    der neuen Audit-Log-Einträge beantwortet. Gelesene Einträge bleiben `ttl`
+    Sekunden im Cache - ein Sturm aus Mitglieder-Updates kostet so nur wenige
+    API-Aufrufe statt einem pro Update.
+    """
+
+    def __init__(self, window: float = 1.5, ttl: float = 60):
+        self.window = window
+        self.ttl = ttl
+        self._entries = {}  # guild_id -> deque[(erstellt_um, target_id, frozenset(role_ids), user)]
+        self._last_entry_id = {}  # guild_id -> ID des neuesten gelesenen Eintrags
+        self._pending = {}  # guild_id -> [(member_id, role_ids, since, future)]
+        self._tasks = set()
+        self.fetches = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, guild_id: int, member_id: int, role_ids: set, since: float):
+        # Neueste passende Änderung zuerst
+        for created_at, target_id, changed, user in reversed(self._entries.get(guild_id, ())):
+            if created_at < since:
+                break
+            if target_id == member_id and changed & role_ids:
+                return user
+        return None
+
+    async def resolve(self, guild: discord.Guild, member_id: int, role_ids: set,
+                      since: float) -> Optional[discord.abc.User]:
+        """Wer hat `role_ids` bei `member_id` seit `since` geändert? None, wenn unbekannt"""
+        if not guild.me or not guild.me.guild_permissions.view_audit_log:
+            return None
+        user = self._lookup(guild.id, member_id, role_ids, since)
+        if user is not None:
+            self.hits += 1
+            return user
+
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending.setdefault(guild.id, [])
+        pending.append((member_id, role_ids, since, future))
+        if len(pending) == 1:
+            task = asyncio.create_task(self._flush(guild))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return await future
+
+    async def _flush(self, guild: discord.Guild):
+        batch = []
+        try:
+            await asyncio.sleep(self.window)
+            batch = self._pending.pop(guild.id, [])
+            await self._fetch(guild)
+        except Exception as e:
+            # Timeout, Verbindungs- oder Parse-Fehler: ohne Zuordnung loggen statt ewig zu warten
+            logger.warning(f"[{guild.name}] Audit-Log konnte nicht gelesen werden: {e}")
+        finally:
+            batch = batch or self._pending.pop(guild.id, [])
+            for member_id, role_ids, since, future in batch:
+                try:
+                    user = self._lookup(guild.id, member_id, role_ids, since)
+                except Exception:
+                    user = None
+                if user is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                if not future.done():
+                    future.set_result(user)
+
+    async def _fetch(self, guild: discord.Guild):
+        """Liest nur Einträge, die seit dem letzten Abruf hinzugekommen sind"""
+        self.fetches += 1
+        entries = self._entries.setdefault(guild.id, deque())
+        now = time.time()
+        # Nie weiter zurück als die TTL - ältere Einträge würden ohnehin verworfen
+        after = discord.utils.time_snowflake(datetime.fromtimestamp(now - self.ttl, tz=timezone.utc))
+        after = discord.Object(id=max(self._last_entry_id.get(guild.id, 0), after))
+
+        async for entry in guild.audit_logs(limit=None, after=after, action=discord.AuditLogAction.member_role_update):
+            self._last_entry_id[guild.id] = max(entry.id, self._last_entry_id.get(guild.id, 0))
+            user = entry.user
+            # Eigene Änderungen des Bots und unbekannte Nutzer sind keine Zuordnung
+            if not isinstance(user, discord.abc.User) or user.id == guild.me.id or entry.target is None:
+                continue
+            changed = frozenset(r.id for r in getattr(entry.changes.after, 'roles', None) or []) | \
+                frozenset(r.id for r in getattr(entry.changes.before, 'roles', None) or [])
+            entries.append((entry.created_at.timestamp(), entry.target.id, changed, user))
+
+        while entries and entries[0][0] < now - self.ttl:
+            entries.popleft()
+
+    def stats(self) -> dict:
+        return {'fetches': self.fetches, 'hits': self.hits, 'misses': self.misses,
+                'cached': sum(len(e) for e in self._entries.values())}
+
+class RetryQueue:
+    """Persistente Warteschlange für fehlgeschlagene automatische Rollenänderungen
+
+    Pro Mitglied gibt es höchstens einen Eintrag; neue Fehlschläge werden
+    zusammengeführt. Die Wartezeit wächst exponentiell mit zufälligem Jitter.
+    """
+
+    def __init__(self, path: str = 'retry_queue.json', base_delay: float = 2, max_delay: float = 300,
+                 max_attempts: int = 10):
+        self.path = path
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.entries = {}  # "guild_id:member_id" -> {'add', 'remove', 'attempts', 'next_at', 'reason'}
+        self._heap = []
+        self.dirty = False
+        self.wakeup = asyncio.Event()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json_loads(f.read())
+        except FileNotFoundError:
+            self.entries = {}
+        self._heap = [(entry['next_at'], key) for key, entry in self.entries.items()]
+        heapq.heapify(self._heap)
+
+    def save(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(json_dumps(self.entries))
+        self.dirty = False
+
+    def backoff(self, attempts: int) -> float:
+        """Exponentielles Backoff mit vollem Jitter"""
+        return random.uniform(self.base_delay, min(self.max_delay, self.base_delay * 2 ** attempts))
+
+    def enqueue(self, guild_id: str, member_id: int, add_ids: List[int], remove_ids: List[int],
+                reason: str, not_before: float = 0):
+        key = f"{guild_id}:{member_id}"
+        entry = self.entries.get(key, {'add': [], 'remove': [], 'attempts': 0, 'reason': reason})
+
+        # Neuere Änderungen überschreiben ältere für dieselbe Rolle
+        add, remove = set(entry['add']), set(entry['remove'])
+        add = (add - set(remove_ids)) | set(add_ids)
+        remove = (remove - set(add_ids)) | set(remove_ids)
+        entry.update(add=sorted(add), remove=sorted(remove), reason=reason)
+        entry['next_at'] = max(not_before, time.time() + self.backoff(entry['attempts']))
+
+        self.entries[key] = entry
+        heapq.heappush(self._heap, (entry['next_at'], key))
+        self.dirty = True
+        self.wakeup.set()
+
+    def reschedule(self, key: str, next_at: float, count_attempt: bool = True) -> bool:
+        """Plant einen Eintrag neu; False, wenn die maximale Anzahl Versuche erreicht ist"""
+        entry = self.entries[key]
+        if count_attempt:
+            entry['attempts'] += 1
+            if entry['attempts'] >= self.max_attempts:
+                self.drop(key)
+                return False
+        entry['next_at'] = next_at
+        heapq.heappush(self._heap, (next_at, key))
+        self.dirty = True
+        return True
+
+    def drop(self, key: str):
+        if self.entries.pop(key, None) is not None:
+            self.dirty = True
+
+    def next_due(self) -> Optional[float]:
+        # Veraltete Heap-Einträge (zusammengeführt oder erledigt) verwerfen
+        while self._heap:
+            next_at, key = self._heap[0]
+            entry = self.entries.get(key)
+            if entry is not None and entry['next_at'] == next_at:
+                return next_at
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self) -> List[str]:
+        due = []
+        now = time.time()
+        while self.next_due() is not None and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[1])
+        return due
+
+    def __len__(self):
+        return len(self.entries)
+
+class LeaderLease:
+    """Lease-basierte Leader-Wahl für den Aktiv/Standby-Betrieb über eine gemeinsame SQLite-Datei
+
+    Nur der Halter der Lease verarbeitet Events, Commands und Scheduler. Die
+    Standby-Instanz bleibt mit dem Gateway verbunden (Caches bleiben warm) und
+    übernimmt, sobald die Lease nicht mehr erneuert wird.
+    """
+
+    def __init__(self, path: str, holder: str, ttl: float = 15, renew_interval: float = 5):
+        self.path = path
+        self.holder = holder
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.expires_at = 0.0
+        self.term = 0
+        # (letzte Erneuerung, Übernahme), wenn die vorherige Lease abgelaufen statt freigegeben war
+        self.gap: Optional[tuple] = None
+        self.promoted = asyncio.Event()
+        self.on_change = None  # Callback(is_leader: bool)
+        self._lock = threading.Lock()
+
+        # isolation_level=None: Transaktionen selbst steuern (BEGIN IMMEDIATE sperrt für andere Schreiber)
+        self._db = sqlite3.connect(path, timeout=renew_interval, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS lease (
+                name TEXT PRIMARY KEY,
+                holder TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                term INTEGER NOT NULL
+            )
+        """)
+
+    @property
+    def is_leader(self) -> bool:
+        # Auch ohne erfolgreiche Erneuerung endet die Führung spätestens mit der eigenen Lease
+        return self.promoted.is_set() and time.time() < self.expires_at
+
+    def try_acquire(self) -> Optional[tuple]:
+        """Erneuert bzw. übernimmt die Lease atomar; liefert (expires_at, term) oder None"""
+        with self._lock:
+            now = time.time()
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT holder, expires_at, term FROM lease WHERE name = 'leader'"
+                ).fetchone()
+                if row and row[0] != self.holder and row[1] > now:
+                    self._db.execute("COMMIT")
+                    return None
+                if row and row[1] <= now:
+                    # Niemand hat die Lease freigegeben: dazwischen hat keine Instanz Events verarbeitet
+                    self.gap = (row[1] - self.ttl, now)
+                # Neue Amtszeit, sobald die Lease den Halter wechselt
+                term = 1 if row is None else row[2] if row[0] == self.holder else row[2] + 1
+                expires_at = now + self.ttl
+                self._db.execute("""
+                    INSERT INTO lease (name, holder, expires_at, term) VALUES ('leader', ?, ?, ?)
+                    ON CONFLICT(name) DO UPDATE SET holder = excluded.holder,
+                        expires_at = excluded.expires_at, term = excluded.term
+                """, (self.holder, expires_at, term))
+                self._db.execute("COMMIT")
+                return expires_at, term
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _set_leader(self, leader: bool):
+        if leader == self.promoted.is_set():
+            return
+        if leader:
+            self.promoted.set()
+            logger.info(f"Failover: '{self.holder}' ist jetzt aktiv (Amtszeit {self.term})")
+        else:
+            self.promoted.clear()
+            logger.warning(f"Failover: '{self.holder}' hat die Lease verloren und ist jetzt Standby")
+        if self.on_change:
+            self.on_change(leader)
+
+    async def run(self):
+        """Erneuert die Lease regelmäßig bzw. wartet als Standby auf ihren Ablauf"""
+        while True:
+            try:
+                result = await asyncio.to_thread(self.try_acquire)
+            except sqlite3.Error as e:
+                # Datei gesperrt o.ä. - die bestehende Lease gilt bis zu ihrem Ablauf weiter
+                logger.warning(f"Failover: Lease konnte nicht geprüft werden: {e}")
+                if not self.is_leader:
+                    self._set_leader(False)
+            else:
+                if result:
+                    self.expires_at, self.term = result
+                    self._set_leader(True)
+                else:
+                    self._set_leader(False)
+            await asyncio.sleep(self.renew_interval)
+
+    async def wait_until_leader(self):
+        """Blockiert, solange diese Instanz Standby ist"""
+        while not self.is_leader:
+            if self.promoted.is_set():
+                await asyncio.sleep(0.5)  # Lease läuft gerade lokal ab, run() stuft gleich herab
+            else:
+                await self.promoted.wait()
+
+    def release(self):
+        """Gibt die Lease beim Herunterfahren frei, damit die Standby-Instanz sofort übernimmt"""
+        with self._lock:
+            if self.promoted.is_set():
+                self._db.execute("DELETE FROM lease WHERE name = 'leader' AND holder = ?", (self.holder,))
+            self.promoted.clear()
+            self._db.close()
+
+def write_startup_profile(path: str = 'startup_profile.txt', limit: int = 40):
+    """Beendet das cProfile des Starts und schreibt die teuersten Aufrufe in eine Datei"""
+    startup_profiler.disable()
+    stream = io.StringIO()
+    stats = pstats.Stats(startup_profiler, stream=stream)
+    stats.sort_stats('cumulative').print_stats(limit)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(stream.getvalue())
+    logger.info(f"Startup-Profil gespeichert in {path}")
+
+# Dauer-Angaben für zeitlich begrenzte Rollen, z.B. "30m", "12h", "1d12h"
+DURATION_PATTERN = re.compile(r'(\d+)([smhdw])')
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+MAX_DURATION = 365 * 86400
+
+def parse_duration(text: str) -> Optional[int]:
+    """Wandelt eine Dauer wie '1d12h' in Sekunden um (None bei ungültiger Eingabe oder mehr als 365 Tagen)"""
+    text = text.strip().lower().replace(' ', '')
+    if not re.fullmatch(r'(\d+[smhdw])+', text):
+        return None
+    seconds = sum(int(value) * DURATION_UNITS[unit] for value, unit in DURATION_PATTERN.findall(text))
+    if seconds > MAX_DURATION:
+        return None
+    return seconds or None
+
+# Rollen-Erwähnungen oder rohe IDs, z.B. "<@&123> 456, 789"
+ROLE_REF_PATTERN = re.compile(r'<@&(\d+)>|\b(\d{15,21})\b')
+
+def parse_role_refs(text: str) -> List[int]:
+    """Liest Rollen-Erwähnungen/IDs aus einem Text (Reihenfolge bleibt, Duplikate entfallen)"""
+    rest = ROLE_REF_PATTERN.sub('', text)
+    if rest.replace(',', ' ').replace(';', ' ').strip():
+        raise ValueError(f"Nicht erkannt: `{rest.strip()[:100]}` - bitte Rollen erwähnen oder IDs angeben")
+    role_ids = [int(mention or raw) for mention, raw in ROLE_REF_PATTERN.findall(text)]
+    return list(dict.fromkeys(role_ids))
+
+def join_limited(items: List[str], separator: str = ", ", limit: int = 1000) -> str:
+    """Verbindet Einträge bis zur Embed-Feldgrenze und kürzt mit '… und N weitere'"""
+    text = ""
+    for index, item in enumerate(items):
+        candidate = item if not text else text + separator + item
+        if len(candidate) > limit:
+            return f"{text}{separator}… und {len(items) - index} weitere"
+        text = candidate
+    return text
+
+# Sektionen, die /export_config und /import_config abdecken: {key: [role_ids]} je Guild
+CONFIG_TRANSFER_SECTIONS = ('role_connections', 'command_permissions')
+CSV_SECTIONS = {'connection': 'role_connections', 'permission': 'command_permissions'}
+CSV_FIELDS = ('section', 'key', 'role_id')
+
+def export_sections_csv(sections: dict) -> str:
+    """Schreibt die Sektionen als CSV mit einer Zeile pro Rolle"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_FIELDS)
+    for csv_name, section in CSV_SECTIONS.items():
+        for key, role_ids in sections.get(section, {}).items():
+            for role_id in role_ids:
+                writer.writerow((csv_name, key, role_id))
+    return buffer.getvalue()
+
+def parse_config_import(filename: str, data: bytes) -> dict:
+    """Liest eine Import-Datei (JSON oder CSV) in {section: {key: [role_ids]}}
+
+    Enthalten sind nur die Sektionen, die in der Datei vorkommen. Eine leere
+    Rollenliste bedeutet beim Zusammenführen: Eintrag entfernen.
+    """
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise ValueError("Die Datei ist nicht UTF-8-kodiert")
+
+    sections = {}
+    if filename.lower().endswith('.csv'):
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames or not set(CSV_FIELDS) <= {f.strip() for f in reader.fieldnames}:
+            raise ValueError(f"CSV benötigt die Spalten {', '.join(CSV_FIELDS)}")
+        reader.fieldnames = [f.strip() for f in reader.fieldnames]
+        for line, row in enumerate(reader, start=2):
+            section = CSV_SECTIONS.get((row['section'] or '').strip().lower())
+            key = (row['key'] or '').strip()
+            role_id = (row['role_id'] or '').strip()
+            if section is None:
+                raise ValueError(f"Zeile {line}: unbekannte Sektion `{row['section']}` "
+                                 f"(erlaubt: {', '.join(CSV_SECTIONS)})")
+            if not key:
+                raise ValueError(f"Zeile {line}: leere Spalte `key`")
+            entries = sections.setdefault(section, {}).setdefault(key, [])
+            if not role_id:
+                continue  # Zeile ohne Rolle: Eintrag entfernen
+            if not role_id.isdigit():
+                raise ValueError(f"Zeile {line}: ungültige Rollen-ID `{role_id}`")
+            if int(role_id) not in entries:
+                entries.append(int(role_id))
+        return sections
+
+    try:
+        raw = json_loads(text)
+    except ValueError as e:
+        raise ValueError(f"Ungültiges JSON: {e}")
+    if not isinstance(raw, dict):
+        raise ValueError("Das JSON muss ein Objekt mit den Sektionen sein")
+    for section in CONFIG_TRANSFER_SECTIONS:
+        if section not in raw:
+            continue
+        if not isinstance(raw[section], dict):
+            raise ValueError(f"`{section}` muss ein Objekt sein")
+        sections[section] = {}
+        for key, role_ids in raw[section].items():
+            if not isinstance(role_ids, list):
+                raise ValueError(f"`{section}.{key}` muss eine Liste von Rollen-IDs sein")
+            try:
+                sections[section][str(key)] = list(dict.fromkeys(int(r) for r in role_ids))
+            except (TypeError, ValueError):
+                raise ValueError(f"`{section}.{key}` enthält eine ungültige Rollen-ID")
+    if not sections:
+        raise ValueError(f"Keine der Sektionen {', '.join(CONFIG_TRANSFER_SECTIONS)} gefunden")
+    return sections
+
+def diff_sections(current: dict, target: dict) -> dict:
+    """Vergleicht {key: [role_ids]} vorher/nachher (Reihenfolge der Rollen zählt nicht)
+
+    Leere Rollenlisten wirken wie ein fehlender Eintrag und erscheinen nicht im Diff.
+    """
+    current = {k: v for k, v in current.items() if v}
+    target = {k: v for k, v in target.items() if v}
+    return {
+        'added': [k for k in target if k not in current],
+        'removed': [k for k in current if k not in target],
+        'changed': [k for k in target if k in current and set(target[k]) != set(current[k])]
+    }
+
+RULE_TYPES = {
+    'all': "Alle Rollen benötigt",
+    'any': "Eine der Rollen genügt",
+    'exclusive': "Exklusive Gruppe"
+}
+
+class RoleRuleSet:
+    """Kompilierte Regeln einer Guild mit Index Rolle -> betroffene Regeln
+
+    Regelformate in der Config:
+        {"type": "all", "requires": [A, B], "grant": X}   X nur wenn A und B vorhanden
+        {"type": "any", "requires": [A, B, C], "grant": X}  X wenn eine von A/B/C vorhanden
+        {"type": "exclusive", "roles": [A, B, C]}          neue Rolle entfernt die anderen
+    """
+
+    def __init__(self, rules: List[dict]):
+        self.rules = rules
+        self.index = {}  # role_id -> [Regel-Indizes, deren Eingaben die Rolle enthalten]
+        self.grants = {}  # role_id -> [Regel-Indizes, die diese Rolle vergeben]
+
+        for i, rule in enumerate(rules):
+            inputs = rule['roles'] if rule['type'] == 'exclusive' else rule['requires']
+            for role_id in inputs:
+                self.index.setdefault(role_id, []).append(i)
+            if rule['type'] != 'exclusive':
+                self.grants.setdefault(rule['grant'], []).append(i)
+
+    def granted(self, role_ids: set) -> set:
+        """Alle Rollen, die Regeln bei diesen Rollen vergeben"""
+        return {grant for grant, indices in self.grants.items()
+                if any(self._satisfied(self.rules[i], role_ids) for i in indices)}
+
+    def _satisfied(self, rule: dict, role_ids: set) -> bool:
+        if rule['type'] == 'all':
+            return all(r in role_ids for r in rule['requires'])
+        return any(r in role_ids for r in rule['requires'])
+
+    def evaluate(self, role_ids: set, added_ids: set, removed_ids: set):
+        """Wertet nur die Regeln aus, deren Eingaben sich geändert haben
+
+        Gibt (hinzuzufügende, zu entfernende) Rollen-IDs als ein gemeinsames Diff zurück.
+        """
+        touched = set()
+        for role_id in added_ids | removed_ids:
+            touched.update(self.index.get(role_id, ()))
+
+        to_add, to_remove = set(), set()
+        granted_checked = set()
+
+        for i in sorted(touched):
+            rule = self.rules[i]
+
+            if rule['type'] == 'exclusive':
+                new_roles = [r for r in rule['roles'] if r in added_ids]
+                if new_roles:
+                    keep = new_roles[0]
+                    to_remove.update(r for r in rule['roles'] if r != keep and r in role_ids)
+                continue
+
+            # Mehrere Regeln können dieselbe Rolle vergeben - sie bleibt, solange eine davon erfüllt ist
+            grant = rule['grant']
+            if grant in granted_checked:
+                continue
+            granted_checked.add(grant)
+
+            wanted = any(self._satisfied(self.rules[j], role_ids) for j in self.grants[grant])
+            if wanted and grant not in role_ids:
+                to_add.add(grant)
+            elif not wanted and grant in role_ids:
+                to_remove.add(grant)
+
+        # Entfernen hat Vorrang (z.B. bei exklusiven Gruppen)
+        to_add -= to_remove
+        return to_add, to_remove
+
+# Sektionen, die pro Guild in einer eigenen Datei liegen bzw. global in config.json bleiben.
+# role_expiries bleibt global, weil der Ablauf-Scheduler beim Start alle Einträge braucht.
+GUILD_SECTIONS = ('role_connections', 'log_channels', 'command_permissions',
+                  'role_rules', 'log_webhooks', 'throttles')
+GLOBAL_SECTIONS = ('role_expiries',)
+
+class GuildSectionView(MutableMapping):
+    """Eine Sektion über alle Guilds: config['role_connections'][guild_id] lädt die Guild erst bei Bedarf
+
+    Iterieren liest alle Guild-Dateien ein und ist nur für seltene Aufgaben gedacht.
+    """
+
+    def __init__(self, store: 'ConfigStore', section: str):
+        self._store = store
+        self._section = section
+
+    def __getitem__(self, guild_id):
+        return self._store.guild(guild_id)[self._section]
+
+    def __setitem__(self, guild_id, value):
+        self._store.guild(guild_id)[self._section] = value
+
+    def __delitem__(self, guild_id):
+        del self._store.guild(guild_id)[self._section]
+
+    def __contains__(self, guild_id) -> bool:
+        return self._section in self._store.guild(guild_id)
+
+    def __iter__(self):
+        for guild_id in self._store.guild_ids():
+            if self._section in self._store.guild(guild_id):
+                yield guild_id
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+class ConfigStore:
+    """Konfiguration mit einer Datei pro Guild, LRU-Cache und Write-Back
+
+    Nur Guilds, auf die zugegriffen wird, liegen im Speicher (höchstens `capacity`).
+    save() schreibt ausschließlich Guilds, die seit dem letzten Speichern benutzt
+    wurden und sich tatsächlich geändert haben; verdrängte Guilds werden vorher
+    zurückgeschrieben. Globale Sektionen bleiben in config.json.
+    """
+
+    def __init__(self, path: str, guild_dir: str, capacity: int = 500):
+        self.path = path
+        self.guild_dir = guild_dir
+        self.capacity = capacity
+        self.globals = {section: {} for section in GLOBAL_SECTIONS}
+        self._views = {section: GuildSectionView(self, section) for section in GUILD_SECTIONS}
+        self._cache = OrderedDict()  # guild_id -> {section: wert}, älteste zuerst
+        self._saved = {}  # guild_id -> Hash des zuletzt gespeicherten Inhalts
+        self._touched = set()  # seit dem letzten save() benutzte Guilds
+        self._saved_globals = None
+        self.loads = 0
+        self.evictions = 0
+
+    def __getitem__(self, section: str):
+        if section in self._views:
+            return self._views[section]
+        return self.globals[section]
+
+    def __contains__(self, section: str) -> bool:
+        return section in self._views or section in self.globals
+
+    def _guild_path(self, guild_id: str) -> str:
+        return os.path.join(self.guild_dir, f"{guild_id}.json")
+
+    def load(self):
+        """Liest config.json und überführt eine alte Gesamt-Konfiguration einmalig in Guild-Dateien"""
+        os.makedirs(self.guild_dir, exist_ok=True)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json_loads(f.read())
+        except FileNotFoundError:
+            data = {}
+
+        for section in GLOBAL_SECTIONS:
+            self.globals[section] = data.get(section, {})
+
+        legacy = [section for section in GUILD_SECTIONS if section in data]
+        if legacy:
+            self._migrate(data, legacy)
+        elif os.path.exists(self.path):
+            self._saved_globals = hash(json_dumps(self.globals, indent=True))
+        self._write_globals()
+
+    def _migrate(self, data: dict, sections: List[str]):
+        backup = f"{self.path}.bak"
+        with open(backup, 'w', encoding='utf-8') as f:
+            f.write(json_dumps(data, indent=True))
+
+        records = {}
+        for section in sections:
+            for guild_id, value in data[section].items():
+                records.setdefault(str(guild_id), {})[section] = value
+        for guild_id, record in records.items():
+            # Bereits vorhandene Guild-Dateien haben Vorrang vor der alten Gesamtdatei
+            record.update(self._read_guild(guild_id))
+            self._write_file(self._guild_path(guild_id), json_dumps(record, indent=True))
+        logger.info(f"Konfiguration migriert: {len(records)} Guild(s) nach '{self.guild_dir}' "
+                    f"(Sicherung: {backup})")
+
+    def _read_guild(self, guild_id: str) -> dict:
+        try:
+            with open(self._guild_path(guild_id), 'r', encoding='utf-8') as f:
+                return json_loads(f.read())
+        except FileNotFoundError:
+            return {}
+
+    @staticmethod
+    def _write_file(path: str, text: str):
+        # Erst vollständig schreiben, dann atomar ersetzen - ein Absturz hinterlässt keine halbe Datei
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def guild(self, guild_id) -> dict:
+        """Einstellungen einer Guild (lädt bei Bedarf und markiert sie für das nächste save())"""
+        guild_id = str(guild_id)
+        record = self._cache.get(guild_id)
+        if record is None:
+            record = self._read_guild(guild_id)
+            self._cache[guild_id] = record
+            self._saved[guild_id] = hash(json_dumps(record, indent=True)) if record else hash('')
+            self.loads += 1
+            self._evict()
+        else:
+            self._cache.move_to_end(guild_id)
+        self._touched.add(guild_id)
+        return record
+
+    def guild_ids(self) -> List[str]:
+        """Alle Guilds mit gespeicherter oder geladener Konfiguration"""
+        stored = {name[:-5] for name in os.listdir(self.guild_dir) if name.endswith('.json')}
+        return sorted(stored | set(self._cache))
+
+    def _evict(self):
+        while len(self._cache) > self.capacity:
+            guild_id = next(iter(self._cache))
+            if guild_id in self._touched:
+                self._write_guild(guild_id)  # Write-Back vor dem Verdrängen
+                self._touched.discard(guild_id)
+            del self._cache[guild_id]
+            self._saved.pop(guild_id, None)
+            self.evictions += 1
+
+    def _write_guild(self, guild_id: str) -> bool:
+        record = self._cache[guild_id]
+        text = json_dumps(record, indent=True) if record else ''
+        if hash(text) == self._saved.get(guild_id):
+            return False
+        path = self._guild_path(guild_id)
+        if record:
+            self._write_file(path, text)
+        elif os.path.exists(path):
+            os.remove(path)  # Guild ohne Einstellungen (z.B. nach prune_guild)
+        self._saved[guild_id] = hash(text)
+        return True
+
+    def _write_globals(self) -> bool:
+        text = json_dumps(self.globals, indent=True)
+        if hash(text) == self._saved_globals:
+            return False
+        self._write_file(self.path, text)
+        self._saved_globals = hash(text)
+        return True
+
+    def save(self) -> int:
+        """Schreibt geänderte Guilds und die globalen Sektionen; liefert die Anzahl geschriebener Dateien"""
+        written = sum(self._write_guild(guild_id) for guild_id in self._touched if guild_id in self._cache)
+        self._touched.clear()
+        return written + self._write_globals()
+
+    def stats(self) -> dict:
+        return {'cached': len(self._cache), 'capacity': self.capacity,
+                'loads': self.loads, 'evictions': self.evictions}
+
+class RoleCommandTree(app_commands.CommandTree):
+    """CommandTree mit zentralem Check vor jedem Slash-Command"""
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # Standby-Instanz: die aktive Instanz beantwortet die Interaktion
+        if not self.client.is_leader:
+            return False
+
+        # Throttling vor jeder weiteren Arbeit - die Ablehnung kostet nur eine kurze Antwort
+        if (interaction.type is not discord.InteractionType.application_command
+                or interaction.guild_id is None or interaction.command is None):
+            return True
+        guild_id = str(interaction.guild_id)
+        command_name = interaction.command.qualified_name
+        if command_name in THROTTLE_EXEMPT:
+            return True
+        wait = self.client.throttle.check(guild_id, interaction.user.id, command_name,
+                                          self.client.config['throttles'].get(guild_id, {}))
+        if wait > 0:
+            await interaction.response.send_message(
+                f"<:2533warning:1467278063002845184> Zu viele Anfragen für `/{command_name}` - "
+                f"bitte in {math.ceil(wait)} s erneut versuchen.",
+                ephemeral=True
+            )
+            return False
+        return True
+
 class RoleBot(commands.Bot):
     def __init__(self):
         intents = discord.Intents.default()
@@ -45,50 +1313,84 @@ class RoleBot(commands.Bot):
         intents.message_content = True
         intents.guilds = True
 
-        super().__init__(command_prefix='!', intents=intents)
+        super().__init__(command_prefix='!', intents=intents, tree_cls=RoleCommandTree)
 
         self.config_file = 'config.json'
+        # Einstellungen pro Guild liegen in eigenen Dateien und werden erst bei Bedarf geladen
+        self.guild_config_dir = os.getenv('GUILD_CONFIG_DIR', 'guild_configs')
 
         # Standard-Rollen die IMMER alle Befehle ausführen können (nach Rollen-ID)
         # Füge hier die IDs deiner beiden Standard-Rollen ein
         self.default_admin_roles = [1399855053283528735, 1399855033931137137]
 
-        self.config = self.load_config()
+        with startup_timer.phase('load_config'):
+            self.config = self.load_config()
 
-    def load_config(self):
-        """Lädt die Konfiguration aus der JSON-Datei"""
-        try:
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
+        # Kompilierte Regeln pro Guild (werden beim Speichern bzw. beim ersten Zugriff erstellt)
+        self.compiled_rules = {}
 
-                # Stelle sicher, dass alle benötigten Keys existieren
-                if 'role_connections' not in config:
-                    config['role_connections'] = {}
-                if 'log_channels' not in config:
-                    config['log_channels'] = {}
-                if 'command_permissions' not in config:
-                    config['command_permissions'] = {}
+        # Rollen, die der Bot laut Hierarchie verwalten darf (guild_id -> frozenset), und übersprungene Änderungen
+        self._manageable_roles = {}
+        self.hierarchy_skips = {}  # guild_id -> Counter(role_id -> Anzahl)
 
-                # Speichere aktualisierte Config
-                self.save_config(config)
-                return config
+        # Log-Zustellung per Webhook: eigene HTTP-Session (Connection-Pool) und gecachte Webhook-Objekte
+        self.http_session: Optional[aiohttp.ClientSession] = None
+        self._log_webhooks = {}  # guild_id -> discord.Webhook
 
-        except FileNotFoundError:
-            default_config = {
-                'role_connections': {},  # guild_id: {parent_role_id: [child_role_ids]}
-                'log_channels': {},  # guild_id: channel_id
-                'command_permissions': {}  # guild_id: {command_name: [role_ids]}
-            }
-            self.save_config(default_config)
-            return default_config
-
-    def save_config(self, config=None):
-        """Speichert die Konfiguration in die JSON-Datei"""
-        if config is None:
-            config = self.config
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=4, ensure_ascii=False)
-        logger.info("Konfiguration gespeichert")
+        # Fehlgeschlagene automatische Rollenänderungen und Circuit Breaker pro Guild
+        self.retry_queue = RetryQueue()
+        self._breakers = {}  # guild_id -> CircuitBreaker
+
+        # Zuordnung automatischer Änderungen zum auslösenden Moderator (AUDIT_LOG_ATTRIBUTION=0 schaltet ab)
+        self.attributor: Optional[AuditAttributor] = None
+        if os.getenv('AUDIT_LOG_ATTRIBUTION', '1') == '1':
+            self.attributor = AuditAttributor(window=float(os.getenv('AUDIT_LOG_WINDOW', '1.5')))
+        self._log_tasks = set()
+
+        # Token-Buckets gegen Command-Spam (Limits in config['throttles'], siehe /set_throttle)
+        self.throttle = CommandThrottle()
+
+        # Dauerhafter Verlauf aller Rollenaktionen für /history
+        self.history = AuditHistory(retention_days=int(os.getenv('HISTORY_RETENTION_DAYS', '180')))
+
+        # Überwacht den Event-Loop auf blockierende Handler (Schwelle per Umgebungsvariable anpassbar)
+        self.loop_monitor = LoopMonitor(
+            threshold_ms=float(os.getenv('LOOP_LAG_THRESHOLD_MS', '100')),
+            sample_stack=os.getenv('LOOP_LAG_SAMPLE_STACK', '0') == '1',
+            handler_names=self.handler_names
+        )
+
+        # Min-Heap mit (Ablaufzeit, guild_id, member_id, role_id) - ein einziger Scheduler-Task
+        # arbeitet alle zeitlich begrenzten Rollen ab, egal wie viele es sind
+        self._expiry_heap = []
+        self._expiry_wakeup = asyncio.Event()
+        self._load_expiry_heap()
+
+        # Aktiv/Standby: ohne FAILOVER_LEASE_DB ist diese Instanz immer aktiv
+        self.failover: Optional[LeaderLease] = None
+        if os.getenv('FAILOVER_LEASE_DB'):
+            self.failover = LeaderLease(
+                os.getenv('FAILOVER_LEASE_DB'),
+                holder=os.getenv('FAILOVER_INSTANCE', f"{socket.gethostname()}:{os.getpid()}"),
+                ttl=float(os.getenv('FAILOVER_LEASE_TTL', '15')),
+                renew_interval=float(os.getenv('FAILOVER_RENEW_INTERVAL', '5'))
+            )
+            self.failover.on_change = self._on_leadership_change
+        self.warm_since: Optional[float] = None  # Zeitpunkt des letzten on_ready
+        # Standby merkt sich den Rollenstand vor der ersten Änderung je Mitglied (für das Nachholen)
+        self._standby_changes = deque()  # (gesehen_um, (guild_id, member_id), {role_ids vorher}), älteste zuerst
+
+    def load_config(self) -> ConfigStore:
+        """Lädt die globale Konfiguration; Guild-Einstellungen werden erst bei Bedarf gelesen"""
+        config = ConfigStore(self.config_file, self.guild_config_dir,
+                             capacity=int(os.getenv('CONFIG_CACHE_SIZE', '500')))
+        config.load()
+        return config
+
+    def save_config(self):
+        """Schreibt alle geänderten Guild-Dateien und config.json (unveränderte werden übersprungen)"""
+        written = self.config.save()
+        logger.info(f"Konfiguration gespeichert ({written} Datei(en))")
 
     def has_default_permission(self, member: discord.Member) -> bool:
         """Prüft ob ein User Standard-Berechtigungen hat (Administrator, Manage Roles oder Standard-Admin-Rollen)"""
@@ -115,18 +1417,663 @@ class RoleBot(commands.Bot):
         allowed_roles = self.config['command_permissions'][guild_id][command_name]
         return any(role_id in allowed_roles for role_id in user_roles)
 
-    async def log_action(self, guild: discord.Guild, action_type: str, user: discord.Member, 
-                        details: str, moderator: Optional[discord.Member] = None, 
+    def compile_rules(self, guild_id: str) -> Optional[RoleRuleSet]:
+        """Kompiliert die Regeln einer Guild neu (nach jeder Änderung aufrufen)"""
+        rules = self.config['role_rules'].get(guild_id)
+        self.compiled_rules[guild_id] = RoleRuleSet(rules) if rules else None
+        return self.compiled_rules[guild_id]
+
+    def get_rules(self, guild_id: str) -> Optional[RoleRuleSet]:
+        if guild_id not in self.compiled_rules:
+            return self.compile_rules(guild_id)
+        return self.compiled_rules[guild_id]
+
+    def required_role_ids(self, guild_id: str, role_ids: set) -> set:
+        """Rollen, die Verbindungen und Regeln für die aktuellen Rollen eines Mitglieds verlangen"""
+        required = set()
+        for parent_id, child_ids in self.config['role_connections'].get(guild_id, {}).items():
+            if int(parent_id) in role_ids:
+                required.update(child_ids)
+        rules = self.get_rules(guild_id)
+        if rules:
+            required |= rules.granted(role_ids)
+        return required
+
+    def manageable_role_ids(self, guild: discord.Guild) -> frozenset:
+        """Gecachte Menge der Rollen unterhalb der höchsten Bot-Rolle (ohne verwaltete Rollen)"""
+        cached = self._manageable_roles.get(guild.id)
+        if cached is not None:
+            return cached
+
+        me = guild.me
+        if me is None or not me.guild_permissions.manage_roles:
+            manageable = frozenset()
+        else:
+            top_role = me.top_role
+            manageable = frozenset(
+                role.id for role in guild.roles
+                if role < top_role and not role.managed and not role.is_default()
+            )
+        self._manageable_roles[guild.id] = manageable
+        return manageable
+
+    def invalidate_hierarchy(self, guild_id: int):
+        """Verwirft den Hierarchie-Cache einer Guild (bei Rollenänderungen)"""
+        self._manageable_roles.pop(guild_id, None)
+
+    def filter_manageable(self, guild: discord.Guild, roles: List[discord.Role]) -> List[discord.Role]:
+        """Lässt nur Rollen durch, die der Bot ändern darf - der Rest wird gezählt statt an der API zu scheitern"""
+        manageable = self.manageable_role_ids(guild)
+        allowed = [role for role in roles if role.id in manageable]
+        if len(allowed) != len(roles):
+            skips = self.hierarchy_skips.setdefault(str(guild.id), Counter())
+            for role in roles:
+                if role.id not in manageable:
+                    skips[role.id] += 1
+        return allowed
+
+    def referenced_role_ids(self, guild_id: str) -> set:
+        """Alle Rollen-IDs, die in der Config einer Guild vorkommen"""
+        role_ids = set()
+        for parent_id, child_ids in self.config['role_connections'].get(guild_id, {}).items():
+            role_ids.add(int(parent_id))
+            role_ids.update(child_ids)
+        for allowed_roles in self.config['command_permissions'].get(guild_id, {}).values():
+            role_ids.update(allowed_roles)
+        for rule in self.config['role_rules'].get(guild_id, []):
+            role_ids.update(rule['roles'] if rule['type'] == 'exclusive' else rule['requires'] + [rule['grant']])
+        for key in self.config['role_expiries'].get(guild_id, {}):
+            role_ids.add(int(key.split(':')[1]))
+        return role_ids
+
+    def prune_roles(self, guild_id: str, role_ids: set) -> dict:
+        """Entfernt gelöschte Rollen aus allen Config-Bereichen (ohne zu speichern)
+
+        Gibt die Anzahl der entfernten Einträge pro Bereich zurück.
+        """
+        removed = {'connections': 0, 'permissions': 0, 'rules': 0, 'expiries': 0}
+
+        connections = self.config['role_connections'].get(guild_id, {})
+        for parent_id in list(connections):
+            if int(parent_id) in role_ids:
+                del connections[parent_id]
+                removed['connections'] += 1
+                continue
+            children = [cid for cid in connections[parent_id] if cid not in role_ids]
+            removed['connections'] += len(connections[parent_id]) - len(children)
+            if children:
+                connections[parent_id] = children
+            else:
+                # Parent ohne Child-Rollen wäre nur noch ein toter Eintrag
+                del connections[parent_id]
+        if guild_id in self.config['role_connections'] and not connections:
+            del self.config['role_connections'][guild_id]
+
+        permissions = self.config['command_permissions'].get(guild_id, {})
+        for command_name in list(permissions):
+            allowed_roles = permissions[command_name]
+            remaining = [rid for rid in allowed_roles if rid not in role_ids]
+            removed['permissions'] += len(allowed_roles) - len(remaining)
+            if remaining:
+                allowed_roles[:] = remaining
+            else:
+                del permissions[command_name]
+        if guild_id in self.config['command_permissions'] and not permissions:
+            del self.config['command_permissions'][guild_id]
+
+        rules = self.config['role_rules'].get(guild_id)
+        if rules:
+            kept = []
+            changed = False
+            for rule in rules:
+                inputs_key = 'roles' if rule['type'] == 'exclusive' else 'requires'
+                rule_inputs = rule[inputs_key]
+                inputs = [rid for rid in rule_inputs if rid not in role_ids]
+                changed = changed or len(inputs) != len(rule_inputs)
+                rule[inputs_key] = inputs
+
+                if rule['type'] == 'exclusive':
+                    valid = len(inputs) >= 2
+                elif rule['type'] == 'all':
+                    # Eine UND-Bedingung mit gelöschter Rolle kann nie mehr erfüllt werden
+                    valid = len(inputs) == len(rule_inputs) and rule['grant'] not in role_ids
+                else:
+                    valid = bool(inputs) and rule['grant'] not in role_ids
+                if valid:
+                    kept.append(rule)
+
+            removed['rules'] = len(rules) - len(kept)
+            if changed or removed['rules']:
+                if kept:
+                    self.config['role_rules'][guild_id] = kept
+                else:
+                    del self.config['role_rules'][guild_id]
+                # Index inkrementell nur für diese Guild neu aufbauen
+                self.compile_rules(guild_id)
+
+        expiries = self.config['role_expiries'].get(guild_id, {})
+        for key in [k for k in expiries if int(k.split(':')[1]) in role_ids]:
+            del expiries[key]
+            removed['expiries'] += 1
+        if guild_id in self.config['role_expiries'] and not expiries:
+            del self.config['role_expiries'][guild_id]
+
+        return removed
+
+    def prune_guild(self, guild_id: str) -> bool:
+        """Entfernt alle Einträge einer Guild (z.B. wenn der Bot sie verlassen hat)"""
+        found = False
+        for section in ('role_connections', 'log_channels', 'command_permissions',
+                        'role_expiries', 'role_rules', 'log_webhooks', 'throttles'):
+            if self.config[section].pop(guild_id, None) is not None:
+                found = True
+        self.compiled_rules.pop(guild_id, None)
+        self._log_webhooks.pop(guild_id, None)
+        return found
+
+    def export_sections(self, guild_id: str) -> dict:
+        """Verbindungen und Berechtigungen einer Guild für /export_config
+
+        Leere Rollenlisten werden nicht exportiert - beim Import bedeuten sie "Eintrag entfernen".
+        """
+        return {section: {key: list(role_ids) for key, role_ids in self.config[section].get(guild_id, {}).items()
+                          if role_ids}
+                for section in CONFIG_TRANSFER_SECTIONS}
+
+    def validate_import(self, guild: discord.Guild, sections: dict) -> Tuple[List[str], List[str]]:
+        """Prüft alle Rollen-IDs und Command-Namen eines Imports in einem Durchgang
+
+        Gibt (Fehler, Warnungen) zurück. Unbekannte Command-Namen, die schon in der
+        Config stehen (ältere Versionen haben Namen nicht geprüft), sind nur Warnungen.
+        """
+        known_roles = {role.id for role in guild.roles}
+        known_commands = {command.name for command in self.tree.get_commands()}
+        existing_commands = self.config['command_permissions'].get(str(guild.id), {})
+        referenced = set()
+        errors = []
+        warnings = []
+
+        for parent_id, child_ids in sections.get('role_connections', {}).items():
+            if not parent_id.isdigit():
+                errors.append(f"Ungültige Parent-ID `{parent_id}`")
+                continue
+            if int(parent_id) in child_ids:
+                errors.append(f"<@&{parent_id}> ist mit sich selbst verbunden")
+            referenced.add(int(parent_id))
+            referenced.update(child_ids)
+
+        for command_name, role_ids in sections.get('command_permissions', {}).items():
+            if command_name in known_commands:
+                pass
+            elif command_name in existing_commands:
+                warnings.append(f"Unbekannter Command `/{command_name}` (bereits in der Konfiguration)")
+            else:
+                errors.append(f"Unbekannter Command `/{command_name}`")
+            referenced.update(role_ids)
+
+        unknown = sorted(referenced - known_roles)
+        if unknown:
+            errors.append(f"{len(unknown)} unbekannte Rollen-ID(s): " + ", ".join(f"`{r}`" for r in unknown[:20])
+                          + (" …" if len(unknown) > 20 else ""))
+        return errors, warnings
+
+    def build_import(self, guild_id: str, sections: dict, replace: bool) -> dict:
+        """Berechnet die Sektionen nach dem Import, ohne etwas zu ändern"""
+        target = {}
+        for section, entries in sections.items():
+            merged = {} if replace else {k: list(v) for k, v in self.config[section].get(guild_id, {}).items()}
+            for key, role_ids in entries.items():
+                if role_ids:
+                    merged[key] = list(role_ids)
+                else:
+                    merged.pop(key, None)
+            target[section] = merged
+        return target
+
+    def apply_import(self, guild_id: str, target: dict):
+        """Übernimmt alle Sektionen gemeinsam mit genau einem Speichervorgang
+
+        Schlägt das Speichern fehl, wird der vorherige Stand im Speicher wiederhergestellt.
+        """
+        previous = {section: self.config[section].get(guild_id) for section in target}
+        for section, entries in target.items():
+            if entries:
+                self.config[section][guild_id] = entries
+            else:
+                self.config[section].pop(guild_id, None)
+        try:
+            self.save_config()
+        except Exception:
+            for section, entries in previous.items():
+                if entries is None:
+                    self.config[section].pop(guild_id, None)
+                else:
+                    self.config[section][guild_id] = entries
+            raise
+
+    def handler_names(self) -> set:
+        """Namen aller Event-Handler und Command-Callbacks (für die Zuordnung blockierender Stellen)"""
+        names = {cmd.callback.__name__ for cmd in self.tree.walk_commands()
+                 if isinstance(cmd, app_commands.Command)}
+        # Mit @bot.event registrierte Handler liegen als Attribute auf dem Bot
+        names.update(name for name in vars(self) if name.startswith('on_'))
+        names.update(self.extra_events)
+        return names
+
+    def get_metrics(self) -> dict:
+        """Kennzahlen für den /metrics-Endpunkt des Keep-Alive-Servers"""
+        return {
+            'loop': self.loop_monitor.snapshot(),
+            'guilds': len(self.guilds),
+            'hierarchy_skips': sum(sum(c.values()) for c in self.hierarchy_skips.values()),
+            'pending_expiries': len(self._expiry_heap),
+            'retry_queue': len(self.retry_queue),
+            'open_circuits': [gid for gid, b in self._breakers.items() if b.state != 'closed'],
+            'throttled': dict(self.throttle.rejected),
+            'config_cache': self.config.stats(),
+            'attribution': self.attributor.stats() if self.attributor else None,
+            'failover': None if self.failover is None else {
+                'instance': self.failover.holder,
+                'leader': self.failover.is_leader,
+                'term': self.failover.term,
+                'lease_expires_in': round(max(0.0, self.failover.expires_at - time.time()), 1)
+            },
+            'performance': performance_status()
+        }
+
+    @property
+    def is_leader(self) -> bool:
+        return self.failover is None or self.failover.is_leader
+
+    async def wait_until_leader(self):
+        if self.failover is not None:
+            await self.failover.wait_until_leader()
+
+    @property
+    def standby_window(self) -> float:
+        """So lange kann eine Lücke zwischen letzter Erneuerung und Übernahme höchstens dauern"""
+        return self.failover.ttl + 2 * self.failover.renew_interval
+
+    def remember_standby_change(self, guild_id: int, member_id: int, role_ids_before: set):
+        """Merkt eine Rollenänderung, die die aktive Instanz bearbeitet (oder verpasst) hat"""
+        now = time.time()
+        self._standby_changes.append((now, (guild_id, member_id), role_ids_before))
+        # Älteste Einträge liegen vorne - alles außerhalb des Fensters verwerfen
+        while self._standby_changes and now - self._standby_changes[0][0] > self.standby_window:
+            self._standby_changes.popleft()
+
+    def _on_leadership_change(self, leader: bool):
+        if leader:
+            self._catch_up_task = asyncio.create_task(self.catch_up())
+
+    async def catch_up(self):
+        """Nach einer Übernahme: Stand neu laden und verpasste Rollenänderungen nachholen"""
+        promoted_at = time.time()
+        await self.wait_until_ready()
+
+        # Die vorherige aktive Instanz hat evtl. Config, Abläufe und Retry-Queue geändert
+        self.config = self.load_config()
+        self.compiled_rules.clear()
+        self._load_expiry_heap()
+        self._expiry_wakeup.set()
+        self.retry_queue._load()
+        self.retry_queue.wakeup.set()
+
+        events, self._standby_changes = self._standby_changes, deque()
+        gap, self.failover.gap = self.failover.gap, None
+        warm = self.warm_since is not None and promoted_at - self.warm_since >= self.standby_window
+        if gap is None:
+            # Lease wurde sauber freigegeben: die vorherige Instanz hat alles selbst verarbeitet
+            logger.info("Failover: Übergabe ohne Lücke, nichts nachzuholen")
+        elif warm:
+            # Standby war lange genug verbunden: nur Änderungen nach der letzten Erneuerung der
+            # alten Instanz prüfen - frühere hat sie selbst verarbeitet
+            changes = {}
+            for seen_at, key, role_ids_before in events:
+                if seen_at >= gap[0]:
+                    changes.setdefault(key, role_ids_before)
+            checked = 0
+            for (guild_id, member_id), role_ids_before in changes.items():
+                guild = self.get_guild(guild_id)
+                member = guild.get_member(member_id) if guild else None
+                if member is None or not self.is_leader:
+                    continue
+                role_ids_now = {r.id for r in member.roles}
+                added = {guild.get_role(rid) for rid in role_ids_now - role_ids_before} - {None}
+                removed = {guild.get_role(rid) for rid in role_ids_before - role_ids_now} - {None}
+                if added or removed:
+                    await sync_member_roles(member, added, removed)
+                    checked += 1
+            logger.info(f"Failover: {checked} Mitglied(er) aus dem Lückenfenster erneut abgeglichen")
+        elif os.getenv('FAILOVER_COLD_RECONCILE') == '1':
+            # Kaltstart nach einem Ausfall: Lücke unbekannt - alle Mitglieder mit Parent-Rollen abgleichen.
+            # Nur auf Wunsch, weil dabei auch bewusst entfernte Child-Rollen zurückkommen.
+            fixed = await self.reconcile_connections()
+            logger.info(f"Failover: Abgleich nach Kaltstart, {fixed} Mitglied(er) korrigiert")
+        else:
+            lost = round(gap[1] - gap[0], 1)
+            logger.warning(f"Failover: Kaltstart nach Ausfall - Änderungen aus ca. {lost} s konnten nicht "
+                           f"nachgeholt werden (FAILOVER_COLD_RECONCILE=1 gleicht alle Mitglieder ab)")
+
+    async def reconcile_connections(self) -> int:
+        """Vergibt fehlende Child-Rollen an alle Mitglieder mit Parent-Rolle (nur hinzufügen)"""
+        fixed = 0
+        for guild in self.guilds:
+            connections = self.config['role_connections'].get(str(guild.id))
+            if not connections:
+                continue
+            missing = {}  # member -> fehlende Child-Rollen
+            for parent_id, child_ids in connections.items():
+                parent = guild.get_role(int(parent_id))
+                if parent is None:
+                    continue
+                children = [r for r in (guild.get_role(cid) for cid in child_ids) if r]
+                for member in parent.members:
+                    for child in children:
+                        if child not in member.roles:
+                            missing.setdefault(member, set()).add(child)
+
+            for member, roles in missing.items():
+                if not self.is_leader:
+                    return fixed
+                roles = self.filter_manageable(guild, list(roles))
+                if roles and await self.apply_role_changes(member, "Verbundene Rollen nach Failover nachgeholt", add=roles):
+                    fixed += 1
+                    await self.log_action(
+                        guild,
+                        "Automatisch zugewiesen",
+                        member,
+                        f"Nach Failover nachgeholt: {', '.join(r.name for r in roles)}",
+                        roles=roles
+                    )
+        return fixed
+
+    def _load_expiry_heap(self):
+        """Baut den Ablauf-Heap aus den gespeicherten Ablaufzeiten auf (überlebt Neustarts)"""
+        self._expiry_heap = []
+        for guild_id, entries in self.config['role_expiries'].items():
+            for key, expires_at in entries.items():
+                member_id, role_id = key.split(':')
+                self._expiry_heap.append((expires_at, guild_id, int(member_id), int(role_id)))
+        heapq.heapify(self._expiry_heap)
+
+    def schedule_role_expiry(self, guild_id: str, member_id: int, role_id: int, expires_at: float):
+        """Merkt eine Rolle zum automatischen Entfernen vor"""
+        guild_expiries = self.config['role_expiries'].setdefault(guild_id, {})
+        guild_expiries[f"{member_id}:{role_id}"] = expires_at
+        heapq.heappush(self._expiry_heap, (expires_at, guild_id, member_id, role_id))
+        self._expiry_wakeup.set()
+
+    def cancel_role_expiry(self, guild_id: str, member_id: int, role_id: int) -> bool:
+        """Entfernt eine geplante Ablaufzeit; der Heap-Eintrag wird beim Abarbeiten verworfen"""
+        guild_expiries = self.config['role_expiries'].get(guild_id)
+        if not guild_expiries or f"{member_id}:{role_id}" not in guild_expiries:
+            return False
+        del guild_expiries[f"{member_id}:{role_id}"]
+        if not guild_expiries:
+            del self.config['role_expiries'][guild_id]
+        return True
+
+    async def _expiry_scheduler(self):
+        """Einziger Task, der abgelaufene Rollen entfernt - schläft bis zum nächsten Ablauf"""
+        await self.wait_until_ready()
+
+        while not self.is_closed():
+            await self.wait_until_leader()
+            self._expiry_wakeup.clear()
+
+            if not self._expiry_heap:
+                await self._expiry_wakeup.wait()
+                continue
+
+            delay = self._expiry_heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._expiry_wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Alle fälligen Einträge auf einmal abarbeiten, damit nur einmal gespeichert wird
+            due = []
+            now = time.time()
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                expires_at, guild_id, member_id, role_id = heapq.heappop(self._expiry_heap)
+                guild_expiries = self.config['role_expiries'].get(guild_id, {})
+                # Veraltete Einträge (abgebrochen oder neu geplant) überspringen
+                if guild_expiries.get(f"{member_id}:{role_id}") != expires_at:
+                    continue
+                self.cancel_role_expiry(guild_id, member_id, role_id)
+                due.append((guild_id, member_id, role_id))
+
+            if due:
+                self.save_config()
+
+            for guild_id, member_id, role_id in due:
+                await self._revoke_expired_role(guild_id, member_id, role_id)
+
+    def get_breaker(self, guild_id: str) -> CircuitBreaker:
+        if guild_id not in self._breakers:
+            self._breakers[guild_id] = CircuitBreaker()
+        return self._breakers[guild_id]
+
+    async def apply_role_changes(self, member: discord.Member, reason: str,
+                                 add: List[discord.Role] = (), remove: List[discord.Role] = ()) -> bool:
+        """Führt eine automatische Rollenänderung aus oder stellt sie bei API-Störungen zurück
+
+        Gibt True zurück, wenn die Änderung sofort durchgeführt wurde. Bei vorübergehenden
+        Fehlern (oder offenem Circuit Breaker) landet sie in der Retry-Queue.
+        Andere Fehler werden wie bisher an den Aufrufer weitergegeben.
+        """
+        guild_id = str(member.guild.id)
+        breaker = self.get_breaker(guild_id)
+
+        if not breaker.allow():
+            self.retry_queue.enqueue(guild_id, member.id, [r.id for r in add], [r.id for r in remove],
+                                     reason, not_before=breaker.reopens_at())
+            return False
+
+        try:
+            if add:
+                await member.add_roles(*add, reason=reason)
+            if remove:
+                await member.remove_roles(*remove, reason=reason)
+        except Exception as e:
+            if not is_transient_error(e):
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            self.retry_queue.enqueue(guild_id, member.id, [r.id for r in add], [r.id for r in remove], reason)
+            logger.warning(f"[{member.guild.name}] Rollenänderung für {member} zurückgestellt: {e}")
+            return False
+
+        breaker.record_success()
+        return True
+
+    async def _retry_worker(self):
+        """Arbeitet die Retry-Queue ab, sobald Einträge fällig sind"""
+        await self.wait_until_ready()
+        queue = self.retry_queue
+
+        while not self.is_closed():
+            await self.wait_until_leader()
+            queue.wakeup.clear()
+            if queue.dirty:
+                queue.save()
+
+            next_at = queue.next_due()
+            delay = None if next_at is None else next_at - time.time()
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(queue.wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            for key in queue.pop_due():
+                await self._retry_entry(key)
+            # Zwischen zwei Durchläufen immer an den Event-Loop abgeben
+            await asyncio.sleep(0)
+
+    async def _retry_entry(self, key: str):
+        queue = self.retry_queue
+        entry = queue.entries[key]
+        guild_id, member_id = key.split(':')
+
+        guild = self.get_guild(int(guild_id))
+        member = guild.get_member(int(member_id)) if guild else None
+        if not member:
+            queue.drop(key)
+            return
+
+        breaker = self.get_breaker(guild_id)
+        if not breaker.allow():
+            # Nie in die Vergangenheit planen - sonst dreht der Worker ohne zu warten im Kreis
+            queue.reschedule(key, max(breaker.reopens_at(), time.time()) + random.uniform(1, 5),
+                             count_attempt=False)
+            return
+
+        # Nur noch nötige Änderungen ausführen - der Zustand kann sich inzwischen geändert haben.
+        # Vergeben nur, was eine Parent-Rolle oder Regel weiterhin verlangt; entfernen nur, was keine mehr verlangt.
+        required = self.required_role_ids(guild_id, {r.id for r in member.roles})
+        add = [r for r in (guild.get_role(rid) for rid in entry['add'])
+               if r and r not in member.roles and r.id in required]
+        remove = [r for r in (guild.get_role(rid) for rid in entry['remove'])
+                  if r and r in member.roles and r.id not in required]
+        add = self.filter_manageable(guild, add)
+        remove = self.filter_manageable(guild, remove)
+        if not add and not remove:
+            breaker.release_probe()
+            queue.drop(key)
+            return
+
+        try:
+            if add:
+                await member.add_roles(*add, reason=entry['reason'])
+            if remove:
+                await member.remove_roles(*remove, reason=entry['reason'])
+        except Exception as e:
+            if is_transient_error(e):
+                breaker.record_failure()
+                if not queue.reschedule(key, time.time() + queue.backoff(entry['attempts'] + 1)):
+                    logger.error(f"[{guild.name}] Rollenänderung für {member} nach {queue.max_attempts} Versuchen aufgegeben: {e}")
+            else:
+                # Die API hat geantwortet - ein Testversuch darf den Breaker nicht halb offen zurücklassen
+                breaker.record_success()
+                queue.drop(key)
+                logger.error(f"Fehler beim Wiederholen einer Rollenänderung: {e}")
+            return
+
+        breaker.record_success()
+        queue.drop(key)
+
+        if add:
+            await self.log_action(guild, "Automatisch zugewiesen", member,
+                                  f"Nach {entry['attempts'] + 1} Wiederholung(en) zugewiesen: {', '.join(r.name for r in add)}",
+                                  roles=add)
+        if remove:
+            await self.log_action(guild, "Automatisch entfernt", member,
+                                  f"Nach {entry['attempts'] + 1} Wiederholung(en) entfernt: {', '.join(r.name for r in remove)}",
+                                  roles=remove)
+
+    async def _revoke_expired_role(self, guild_id: str, member_id: int, role_id: int):
+        """Entfernt eine abgelaufene Rolle; verbundene Child-Rollen folgen über on_member_update"""
+        guild = self.get_guild(int(guild_id))
+        if not guild:
+            return
+
+        member = guild.get_member(member_id)
+        role = guild.get_role(role_id)
+        if not member or not role or role not in member.roles:
+            return
+        if not self.filter_manageable(guild, [role]):
+            logger.warning(f"[{guild.name}] Abgelaufene Rolle '{role.name}' liegt über der Bot-Rolle und kann nicht entfernt werden")
+            return
+
+        try:
+            if await self.apply_role_changes(member, "Zeitlich begrenzte Rolle abgelaufen", remove=[role]):
+                await self.log_action(
+                    guild,
+                    "Rolle abgelaufen",
+                    member,
+                    f"Zeitlich begrenzte Rolle '{role.name}' ist abgelaufen",
+                    roles=[role]
+                )
+        except Exception as e:
+            logger.error(f"Fehler beim Entfernen einer abgelaufenen Rolle: {e}")
+
+    def get_log_webhook(self, guild_id: str) -> Optional[discord.Webhook]:
+        """Liefert den gecachten Log-Webhook einer Guild (None = Zustellung über den Kanal)"""
+        webhook = self._log_webhooks.get(guild_id)
+        if webhook is None and guild_id in self.config['log_webhooks'] and self.http_session:
+            data = self.config['log_webhooks'][guild_id]
+            webhook = discord.Webhook.partial(data['id'], data['token'], session=self.http_session)
+            self._log_webhooks[guild_id] = webhook
+        return webhook
+
+    def drop_log_webhook(self, guild_id: str) -> bool:
+        """Schaltet eine Guild zurück auf die Zustellung über den Kanal"""
+        self._log_webhooks.pop(guild_id, None)
+        return self.config['log_webhooks'].pop(guild_id, None) is not None
+
+    async def setup_log_webhook(self, channel: discord.TextChannel) -> discord.Webhook:
+        """Verwendet den Log-Webhook des Bots im Kanal wieder oder legt ihn an"""
+        webhook = None
+        for existing in await channel.webhooks():
+            if existing.user and existing.user.id == self.user.id and existing.name == LOG_WEBHOOK_NAME:
+                webhook = existing
+                break
+
+        if webhook is None:
+            webhook = await channel.create_webhook(name=LOG_WEBHOOK_NAME, reason="Log-Zustellung per Webhook")
+
+        guild_id = str(channel.guild.id)
+        self.config['log_webhooks'][guild_id] = {'id': webhook.id, 'token': webhook.token}
+        self._log_webhooks.pop(guild_id, None)
+        return webhook
+
+    async def deliver_log(self, guild_id: str, channel: Optional[discord.TextChannel], embed: discord.Embed):
+        """Sendet ein Log-Embed über den Webhook (eigenes Rate-Limit) oder als Fallback über den Kanal"""
+        webhook = self.get_log_webhook(guild_id)
+        if webhook:
+            try:
+                await webhook.send(embed=embed, username=self.user.name, avatar_url=self.user.display_avatar.url)
+                return
+            except discord.NotFound:
+                # Webhook wurde gelöscht - dauerhaft auf den Kanal zurückfallen
+                logger.warning("Log-Webhook nicht mehr vorhanden, verwende wieder den Log-Kanal")
+                self.drop_log_webhook(guild_id)
+                self.save_config()
+            except Exception as e:
+                logger.error(f"Fehler beim Senden über den Log-Webhook: {e}")
+
+        if channel:
+            try:
+                await channel.send(embed=embed)
+            except Exception as e:
+                logger.error(f"Fehler beim Senden der Log-Nachricht: {e}")
+
+    async def log_action(self, guild: discord.Guild, action_type: str, user: discord.Member,
+                        details: str, moderator: Optional[discord.abc.User] = None,
                         roles: List[discord.Role] = None):
         """Protokolliert Aktionen mit schönen Embeds im Log-Channel"""
         logger.info(f"[{guild.name}] {action_type}: {details}")
 
+        self.history.record(
+            guild.id,
+            user.id,
+            [r.id for r in roles] if roles else [],
+            action_type,
+            moderator.id if moderator else None,
+            details
+        )
+
         guild_id = str(guild.id)
         if guild_id in self.config['log_channels']:
             channel_id = self.config['log_channels'][guild_id]
             channel = guild.get_channel(channel_id)
 
-            if channel:
+            if channel or self.get_log_webhook(guild_id):
                 # Bestimme Farbe und Style basierend auf Aktion
                 if action_type == "Rolle bekommen":
                     color = discord.Color.from_str("#1eff00")
@@ -140,6 +2087,9 @@ class RoleBot(commands.Bot):
                 elif action_type == "Automatisch entfernt":
                     color = discord.Color.from_str("#ff0000")
                     title = "Automatisch entfernt"
+                elif action_type == "Rolle abgelaufen":
+                    color = discord.Color.from_str("#ff0000")
+                    title = "Rolle abgelaufen"
                 else:
                     color = discord.Color.from_str("#647be0")
                     title = f"{action_type}"
@@ -158,6 +2108,13 @@ class RoleBot(commands.Bot):
                     inline=True
                 )
 
+                if moderator:
+                    embed.add_field(
+                        name="<:7549member:1467278105616973997> Moderator",
+                        value=f"> Moderator: {moderator.mention}\n> Username: `{moderator.name}`\n> User-ID: `{moderator.id}`",
+                        inline=True
+                    )
+
                 #Aktionsinformation Rollenverbildungen
                 if action_type == "Rollenverbindung erstellt":
                     embed.add_field(
@@ -185,10 +2142,10 @@ class RoleBot(commands.Bot):
                         value=f"> Rolle: {roles[0].mention}\n> Rollen-ID: `{roles[0].id}`",
                         inline=False)
                 
-                else:
+                elif roles:
                     embed.add_field(
                         name="<:4748ticket:1467278078672633967> Rolle",
-                        value=f"> Rolle: {', '.join([r.mention for r in roles])}",
+                        value=f"> Rolle: {join_limited([r.mention for r in roles])}",
                         inline=False)
                 
                 # Details
@@ -209,22 +2166,88 @@ class RoleBot(commands.Bot):
                 # Thumbnail (User Avatar)
                 embed.set_thumbnail(url=user.display_avatar.url)
 
-                try:
-                    await channel.send(embed=embed)
-                except Exception as e:
-                    logger.error(f"Fehler beim Senden der Log-Nachricht: {e}")
+                await self.deliver_log(guild_id, channel, embed)
+
+    def log_action_later(self, guild: discord.Guild, action_type: str, user: discord.Member, details: str,
+                         roles: List[discord.Role], trigger_roles) -> None:
+        """Loggt eine automatische Aktion im Hintergrund, inklusive Moderator aus dem Audit-Log
+
+        Die Rollenänderung ist zu diesem Zeitpunkt schon erfolgt - sie wartet nie auf die Zuordnung.
+        """
+        task = asyncio.create_task(self._log_attributed(guild, action_type, user, details, roles,
+                                                        {r.id for r in trigger_roles}, time.time() - 30))
+        self._log_tasks.add(task)
+        task.add_done_callback(self._log_tasks.discard)
+
+    async def _log_attributed(self, guild: discord.Guild, action_type: str, user: discord.Member, details: str,
+                              roles: List[discord.Role], trigger_role_ids: set, since: float):
+        moderator = None
+        if self.attributor is not None and trigger_role_ids:
+            try:
+                moderator = await self.attributor.resolve(guild, user.id, trigger_role_ids, since)
+            except Exception as e:
+                logger.warning(f"[{guild.name}] Moderator konnte nicht ermittelt werden: {e}")
+        try:
+            await self.log_action(guild, action_type, user, details, moderator=moderator, roles=roles)
+        except Exception as e:
+            logger.error(f"Fehler beim Loggen von '{action_type}': {e}")
 
     async def setup_hook(self):
         """Wird beim Start des Bots ausgeführt"""
-        await self.tree.sync()
+        startup_timer.end('login')
+        self.loop_monitor.start()
+        self.http_session = aiohttp.ClientSession()
+        self._history_task = asyncio.create_task(self.history.run())
+        self._retry_task = asyncio.create_task(self._retry_worker())
+        if self.failover is not None:
+            self._lease_task = asyncio.create_task(self.failover.run())
+
+        with startup_timer.phase('tree_sync'):
+            await self.tree.sync()
         logger.info("Slash-Commands synchronisiert")
 
+        self._expiry_task = asyncio.create_task(self._expiry_scheduler())
+        logger.info(f"{len(self._expiry_heap)} zeitlich begrenzte Rolle(n) geplant")
+
+        startup_timer.begin('gateway_connect')
+
+    async def close(self):
+        if self.http_session:
+            await self.http_session.close()
+        self.history.close()
+        if self.retry_queue.dirty and self.is_leader:
+            self.retry_queue.save()
+        if self.failover is not None:
+            self.failover.release()
+        await super().close()
+
 bot = RoleBot()
 
+@bot.event
+async def on_connect():
+    # Gateway steht - ab hier folgen READY und das Laden der Mitglieder (Chunking)
+    if startup_timer.report is None and startup_timer.is_running('gateway_connect'):
+        startup_timer.end('gateway_connect')
+        startup_timer.begin('ready_and_chunking')
+
 @bot.event
 async def on_ready():
     logger.info(f'Bot eingeloggt als {bot.user.name} (ID: {bot.user.id})')
     logger.info(f'Verbunden mit {len(bot.guilds)} Server(n)')
+    # Ab jetzt sieht auch eine Standby-Instanz alle Events (Grundlage für das Nachholen)
+    bot.warm_since = time.time()
+    if bot.failover is not None:
+        logger.info(f"Failover: Instanz '{bot.failover.holder}' ist {'aktiv' if bot.is_leader else 'Standby'}")
+
+    # on_ready kann bei Reconnects mehrfach kommen - der Report wird nur einmal erstellt
+    if startup_timer.report is None:
+        startup_timer.end('ready_and_chunking')
+        startup_timer.finish(
+            guilds=len(bot.guilds),
+            members=sum(g.member_count or 0 for g in bot.guilds)
+        )
+        if PROFILE_STARTUP:
+            write_startup_profile()
 
     activity = discord.Activity(
         type=discord.ActivityType.watching,
@@ -235,11 +2258,25 @@ async def on_ready():
 @bot.event
 async def on_member_update(before: discord.Member, after: discord.Member):
     """Überwacht Rollenänderungen und verwaltet verbundene Rollen"""
-    guild_id = str(after.guild.id)
-
     added_roles = set(after.roles) - set(before.roles)
     removed_roles = set(before.roles) - set(after.roles)
 
+    # Ändern sich die Rollen des Bots selbst, verschiebt sich seine Position in der Hierarchie
+    if after.id == bot.user.id and (added_roles or removed_roles):
+        bot.invalidate_hierarchy(after.guild.id)
+
+    if not bot.is_leader:
+        # Standby: nur den Stand vor der Änderung merken, um nach einer Übernahme nachzuholen
+        if added_roles or removed_roles:
+            bot.remember_standby_change(after.guild.id, after.id, {r.id for r in before.roles})
+        return
+
+    await sync_member_roles(after, added_roles, removed_roles)
+
+async def sync_member_roles(after: discord.Member, added_roles: set, removed_roles: set):
+    """Wendet Rollenverbindungen und Regeln auf hinzugefügte/entfernte Rollen eines Mitglieds an"""
+    guild_id = str(after.guild.id)
+
     if guild_id in bot.config['role_connections']:
         connections = bot.config['role_connections'][guild_id]
 
@@ -255,17 +2292,19 @@ async def on_member_update(before: discord.Member, after: discord.Member):
                     if child_role and child_role not in after.roles:
                         child_roles.append(child_role)
 
+                child_roles = bot.filter_manageable(after.guild, child_roles)
                 if child_roles:
                     try:
-                        await after.add_roles(*child_roles, reason="Verbundene Rollen automatisch hinzugefügt")
-                        role_names = ", ".join([r.name for r in child_roles])
-                        await bot.log_action(
-                            after.guild,
-                            "Automatisch zugewiesen",
-                            after,
-                            f"Durch Rolle '{role.name}' wurden automatisch zugewiesen: {role_names}",
-                            roles=child_roles
-                        )
+                        if await bot.apply_role_changes(after, "Verbundene Rollen automatisch hinzugefügt", add=child_roles):
+                            role_names = ", ".join([r.name for r in child_roles])
+                            bot.log_action_later(
+                                after.guild,
+                                "Automatisch zugewiesen",
+                                after,
+                                f"Durch Rolle '{role.name}' wurden automatisch zugewiesen: {role_names}",
+                                roles=child_roles,
+                                trigger_roles=[role]
+                            )
                     except Exception as e:
                         logger.error(f"Fehler beim Hinzufügen verbundener Rollen: {e}")
 
@@ -291,20 +2330,104 @@ async def on_member_update(before: discord.Member, after: discord.Member):
                         if not should_keep_role:
                             roles_to_remove.append(child_role)
 
+                roles_to_remove = bot.filter_manageable(after.guild, roles_to_remove)
                 if roles_to_remove:
                     try:
-                        await after.remove_roles(*roles_to_remove, reason="Verbundene Rollen automatisch entfernt")
-                        role_names = ", ".join([r.name for r in roles_to_remove])
-                        await bot.log_action(
-                            after.guild,
-                            "Automatisch entfernt",
-                            after,
-                            f"Durch Entfernung von '{role.name}' wurden entfernt: {role_names}",
-                            roles=roles_to_remove
-                        )
+                        if await bot.apply_role_changes(after, "Verbundene Rollen automatisch entfernt", remove=roles_to_remove):
+                            role_names = ", ".join([r.name for r in roles_to_remove])
+                            bot.log_action_later(
+                                after.guild,
+                                "Automatisch entfernt",
+                                after,
+                                f"Durch Entfernung von '{role.name}' wurden entfernt: {role_names}",
+                                roles=roles_to_remove,
+                                trigger_roles=[role]
+                            )
                     except Exception as e:
                         logger.error(f"Fehler beim Entfernen verbundener Rollen: {e}")
 
+    # Regeln: nur die Regeln auswerten, deren Eingabe-Rollen sich geändert haben
+    rules = bot.get_rules(guild_id)
+    if rules and (added_roles or removed_roles):
+        add_ids, remove_ids = rules.evaluate(
+            {r.id for r in after.roles},
+            {r.id for r in added_roles},
+            {r.id for r in removed_roles}
+        )
+        roles_to_add = [r for r in (after.guild.get_role(rid) for rid in add_ids) if r]
+        roles_to_remove = [r for r in (after.guild.get_role(rid) for rid in remove_ids) if r]
+        roles_to_add = bot.filter_manageable(after.guild, roles_to_add)
+        roles_to_remove = bot.filter_manageable(after.guild, roles_to_remove)
+
+        if roles_to_add:
+            try:
+                if await bot.apply_role_changes(after, "Rollenregeln automatisch angewendet", add=roles_to_add):
+                    bot.log_action_later(
+                        after.guild,
+                        "Automatisch zugewiesen",
+                        after,
+                        f"Durch Rollenregeln zugewiesen: {', '.join(r.name for r in roles_to_add)}",
+                        roles=roles_to_add,
+                        trigger_roles=added_roles | removed_roles
+                    )
+            except Exception as e:
+                logger.error(f"Fehler beim Anwenden der Rollenregeln: {e}")
+
+        if roles_to_remove:
+            try:
+                if await bot.apply_role_changes(after, "Rollenregeln automatisch angewendet", remove=roles_to_remove):
+                    bot.log_action_later(
+                        after.guild,
+                        "Automatisch entfernt",
+                        after,
+                        f"Durch Rollenregeln entfernt: {', '.join(r.name for r in roles_to_remove)}",
+                        roles=roles_to_remove,
+                        trigger_roles=added_roles | removed_roles
+                    )
+            except Exception as e:
+                logger.error(f"Fehler beim Anwenden der Rollenregeln: {e}")
+
+@bot.event
+async def on_guild_role_update(before: discord.Role, after: discord.Role):
+    """Position oder Berechtigungen einer Rolle geändert - Hierarchie-Cache neu aufbauen"""
+    bot.invalidate_hierarchy(after.guild.id)
+
+@bot.event
+async def on_guild_role_create(role: discord.Role):
+    bot.invalidate_hierarchy(role.guild.id)
+
+@bot.event
+async def on_guild_role_delete(role: discord.Role):
+    """Entfernt eine gelöschte Rolle sofort aus Verbindungen, Berechtigungen, Regeln und Abläufen"""
+    bot.invalidate_hierarchy(role.guild.id)
+    if not bot.is_leader:
+        return  # die aktive Instanz bereinigt die Config
+    guild_id = str(role.guild.id)
+    removed = bot.prune_roles(guild_id, {role.id})
+
+    if any(removed.values()):
+        bot.save_config()
+        logger.info(f"[{role.guild.name}] Gelöschte Rolle '{role.name}' aus der Config entfernt: {removed}")
+
+@bot.event
+async def on_guild_channel_delete(channel: discord.abc.GuildChannel):
+    """Entfernt einen gelöschten Log-Channel aus der Config"""
+    if not bot.is_leader:
+        return
+    guild_id = str(channel.guild.id)
+    if bot.config['log_channels'].get(guild_id) == channel.id:
+        del bot.config['log_channels'][guild_id]
+        bot.drop_log_webhook(guild_id)
+        bot.save_config()
+        logger.info(f"[{channel.guild.name}] Gelöschter Log-Channel '{channel.name}' aus der Config entfernt")
+
+@bot.event
+async def on_guild_remove(guild: discord.Guild):
+    """Entfernt die komplette Config einer Guild, die der Bot verlassen hat"""
+    if bot.is_leader and bot.prune_guild(str(guild.id)):
+        bot.save_config()
+        logger.info(f"Config von '{guild.name}' entfernt (Bot hat den Server verlassen)")
+
 # ========== SLASH COMMANDS ==========
 @bot.tree.command(name="config", description="Zeigt die komplette Bot-Konfiguration")
 async def show_config(interaction: discord.Interaction):
@@ -332,7 +2455,8 @@ async def show_config(interaction: discord.Interaction):
         if channel:
             embed.add_field(
                 name="<:1041searchthreads:1467278040915771596> Log-Kanal",
-                value=f"<:3518checkmark:1467278064340832513> Aktiviert\n> Kanal: {channel.mention}\n> Kanal-ID:  `{channel.id}`",
+                value=f"<:3518checkmark:1467278064340832513> Aktiviert\n> Kanal: {channel.mention}\n> Kanal-ID:  `{channel.id}`"
+                      f"\n> Zustellung: `{'Webhook' if guild_id in bot.config['log_webhooks'] else 'Kanal'}`",
                 inline=False
             )
         else:
@@ -425,7 +2549,27 @@ async def show_config(interaction: discord.Interaction):
     total_roles = len(interaction.guild.roles) - 1
     total_members = interaction.guild.member_count
 
-    stats = f"> Rollen: `{total_roles}`\n> Mitglieder: `{total_members}`\n> Verbindungen:  `{connection_count}`\n> Berechtigungen: `{permission_count}`"
+    rule_count = len(bot.config['role_rules'].get(guild_id, []))
+    throttle_count = sum(len(scopes) for scopes in bot.config['throttles'].get(guild_id, {}).values())
+
+    # 4. Rollen-Hierarchie
+    manageable = bot.manageable_role_ids(interaction.guild)
+    configured_roles = [interaction.guild.get_role(rid) for rid in bot.referenced_role_ids(guild_id)]
+    unmanageable = [r for r in configured_roles if r and r.id not in manageable]
+    skipped = sum(bot.hierarchy_skips.get(guild_id, {}).values())
+    if unmanageable or skipped:
+        hierarchy_text = f"> Nicht verwaltbare Rollen: `{len(unmanageable)}`\n> Übersprungene Änderungen: `{skipped}`"
+        if unmanageable:
+            hierarchy_text += "\n" + ", ".join(r.mention for r in unmanageable[:10])
+            if len(unmanageable) > 10:
+                hierarchy_text += f" *(+{len(unmanageable)-10})*"
+        embed.add_field(
+            name="<:2533warning:1467278063002845184> Rollen-Hierarchie",
+            value=hierarchy_text,
+            inline=False
+        )
+
+    stats = f"> Rollen: `{total_roles}`\n> Mitglieder: `{total_members}`\n> Verbindungen:  `{connection_count}`\n> Regeln: `{rule_count}`\n> Berechtigungen: `{permission_count}`\n> Eigene Limits: `{throttle_count}`"
     embed.add_field(
         name="<:4549activity:1467278075778699344> Statistiken",
         value=stats,
@@ -443,8 +2587,11 @@ async def show_config(interaction: discord.Interaction):
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 @bot.tree.command(name="set_log_channel", description="Setzt den Log-Channel für Rollenaktionen")
-@app_commands.describe(channel="Der Channel für Logs")
-async def set_log_channel(interaction: discord.Interaction, channel: discord.TextChannel):
+@app_commands.describe(
+    channel="Der Channel für Logs",
+    webhook="Logs über einen Webhook senden (eigenes Rate-Limit, benötigt 'Webhooks verwalten')"
+)
+async def set_log_channel(interaction: discord.Interaction, channel: discord.TextChannel, webhook: bool = False):
     # Prüfe Berechtigung
     if not bot.has_default_permission(interaction.user):
         await interaction.response.send_message(
@@ -453,17 +2600,31 @@ async def set_log_channel(interaction: discord.Interaction, channel: discord.Tex
         )
         return
 
+    # Webhook-Einrichtung braucht bis zu zwei REST-Aufrufe - erst bestätigen, dann arbeiten
+    await interaction.response.defer(ephemeral=True)
+
     guild_id = str(interaction.guild_id)
     bot.config['log_channels'][guild_id] = channel.id
+    bot.drop_log_webhook(guild_id)
+
+    delivery = "Kanal"
+    if webhook:
+        try:
+            await bot.setup_log_webhook(channel)
+            delivery = "Webhook"
+        except discord.HTTPException as e:
+            logger.warning(f"[{interaction.guild.name}] Log-Webhook konnte nicht eingerichtet werden: {e}")
+            delivery = "Kanal (Webhook fehlgeschlagen - fehlt 'Webhooks verwalten'?)"
+
     bot.save_config()
 
     embed = discord.Embed(
         title="Log-Channel konfiguriert!",
-        description=f"Alle Rollenaktionen werden nun in {channel.mention} geloggt.",
+        description=f"Alle Rollenaktionen werden nun in {channel.mention} geloggt.\n> Zustellung: `{delivery}`",
         color=discord.Color.from_str("#647be0")
     )
 
-    await interaction.response.send_message(embed=embed, ephemeral=True)
+    await interaction.followup.send(embed=embed, ephemeral=True)
 
     # Sende Test-Nachricht
     test_embed = discord.Embed(
@@ -478,12 +2639,9 @@ async def set_log_channel(interaction: discord.Interaction, channel: discord.Tex
         icon_url=interaction.user.display_avatar.url
     )
 
-    try:
-        await channel.send(embed=test_embed)
-    except:
-        pass
+    await bot.deliver_log(guild_id, channel, test_embed)
 
-@bot.tree.command(name="connect_roles", description="Verbindet bis zu 15 Rollen mit einer Parent-Rolle")
+@bot.tree.command(name="connect_roles", description="Verbindet Child-Rollen mit einer Parent-Rolle")
 @app_commands.describe(
     parent="Die Parent-Rolle",
     child1="Child-Rolle 1",
@@ -500,7 +2658,8 @@ async def set_log_channel(interaction: discord.Interaction, channel: discord.Tex
     child12="Child-Rolle 12 (optional)",
     child13="Child-Rolle 13 (optional)",
     child14="Child-Rolle 14 (optional)",
-    child15="Child-Rolle 15 (optional)"
+    child15="Child-Rolle 15 (optional)",
+    children="Weitere Child-Rollen als Erwähnungen oder IDs, beliebig viele (optional)"
 )
 async def connect_roles(
     interaction: discord.Interaction,
@@ -519,9 +2678,10 @@ async def connect_roles(
     child12: Optional[discord.Role] = None,
     child13: Optional[discord.Role] = None,
     child14: Optional[discord.Role] = None,
-    child15: Optional[discord.Role] = None
+    child15: Optional[discord.Role] = None,
+    children: Optional[str] = None
 ):
-    """Verbindet eine Parent-Rolle mit bis zu 15 Child-Rollen"""
+    """Verbindet eine Parent-Rolle mit beliebig vielen Child-Rollen (15 Auswahlfelder + Textliste)"""
 
     # Prüfe Berechtigung
     if not bot.has_default_permission(interaction.user):
@@ -536,14 +2696,38 @@ async def connect_roles(
                    child9, child10, child11, child12, child13, child14, child15]
     child_roles = [r for r in child_roles if r is not None]
 
-    # Entferne Duplikate
+    # Zusätzliche Rollen aus der Textliste (hebt die Grenze von 15 Auswahlfeldern auf)
+    if children:
+        try:
+            extra_ids = parse_role_refs(children)
+        except ValueError as e:
+            await interaction.response.send_message(f"<:3518crossmark:1467278065729146900> {e}", ephemeral=True)
+            return
+        unknown = [rid for rid in extra_ids if interaction.guild.get_role(rid) is None]
+        if unknown:
+            await interaction.response.send_message(
+                "<:3518crossmark:1467278065729146900> Unbekannte Rollen-ID(s): "
+                + ", ".join(f"`{rid}`" for rid in unknown[:20]),
+                ephemeral=True
+            )
+            return
+        child_roles += [interaction.guild.get_role(rid) for rid in extra_ids]
+
+    # Entferne Duplikate (und die Parent-Rolle selbst)
     unique_children = []
     seen_ids = set()
     for role in child_roles:
-        if role.id not in seen_ids:
+        if role.id not in seen_ids and role.id != parent.id:
             unique_children.append(role)
             seen_ids.add(role.id)
 
+    if not unique_children:
+        await interaction.response.send_message(
+            "<:3518crossmark:1467278065729146900> Eine Rolle kann nicht mit sich selbst verbunden werden!",
+            ephemeral=True
+        )
+        return
+
     guild_id = str(interaction.guild_id)
     parent_id = str(parent.id)
 
@@ -561,7 +2745,7 @@ async def connect_roles(
         color=discord.Color.from_str("#647be0")
     )
 
-    roles_text = "\n".join([f"<:3518checkmark:1467278064340832513> {role.mention}" for role in unique_children])
+    roles_text = join_limited([f"<:3518checkmark:1467278064340832513> {role.mention}" for role in unique_children], "\n")
     embed.add_field(
         name="Verbundene Rolle(n)",
         value=roles_text,
@@ -573,6 +2757,20 @@ async def connect_roles(
         value="Wenn jemand die Hauptrolle erhält, bekommt er automatisch die `verbundene Rolle(n)`.",
         inline=False
     )
+
+    # Einmalige Warnung statt eines 403-Fehlers bei jedem Mitglieder-Update
+    manageable = bot.manageable_role_ids(interaction.guild)
+    unmanageable = [r for r in unique_children if r.id not in manageable]
+    if unmanageable:
+        embed.add_field(
+            name="<:2533warning:1467278063002845184> Warnung",
+            value="Diese Rollen liegen über der höchsten Bot-Rolle und werden übersprungen, "
+                  "bis die Bot-Rolle höher verschoben wird:\n"
+                  + join_limited([f"> {r.mention}" for r in unmanageable], "\n", 850),
+            inline=False
+        )
+        logger.warning(f"[{interaction.guild.name}] Verbindung von '{parent.name}' enthält nicht verwaltbare "
+                       f"Rollen: {', '.join(r.name for r in unmanageable)}")
     embed.set_image(url="https://media.discordapp.net/attachments/1451317020418117724/1467472069330604187/image.png?ex=6980815d&is=697f2fdd&hm=3e2dcbd395cc5f56304d40ad75acbd4508082e75d6af5f06564c138db3604357&=&format=webp&quality=lossless&width=1125&height=256")
 
     await interaction.response.send_message(embed=embed, ephemeral=True)
@@ -678,7 +2876,7 @@ async def list_connections(interaction: discord.Interaction):
             child_roles = [r for r in child_roles if r]
 
             if child_roles:
-                value_text = "\n".join([f"└─ {r.mention}" for r in child_roles])
+                value_text = join_limited([f"└─ {r.mention}" for r in child_roles], "\n")
                 embed.add_field(
                     name=f"{parent_role.name} ({len(child_roles)})",
                     value=value_text,
@@ -692,6 +2890,165 @@ async def list_connections(interaction: discord.Interaction):
 
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
+def describe_rule(guild: discord.Guild, rule: dict) -> str:
+    """Kurze lesbare Darstellung einer Regel"""
+    def mention(role_id):
+        role = guild.get_role(role_id)
+        return role.mention if role else f"`{role_id}`"
+
+    if rule['type'] == 'exclusive':
+        return f"Exklusiv: {' | '.join(mention(r) for r in rule['roles'])}"
+    joiner = " + " if rule['type'] == 'all' else " / "
+    return f"{joiner.join(mention(r) for r in rule['requires'])} → {mention(rule['grant'])}"
+
+@bot.tree.command(name="add_rule", description="Erstellt eine Rollenregel (UND, ODER oder exklusive Gruppe)")
+@app_commands.describe(
+    rule_type="Art der Regel",
+    role1="Rolle 1",
+    role2="Rolle 2",
+    role3="Rolle 3 (optional)",
+    role4="Rolle 4 (optional)",
+    role5="Rolle 5 (optional)",
+    grant="Die Rolle, die vergeben wird (nicht bei exklusiven Gruppen)"
+)
+@app_commands.choices(rule_type=[
+    app_commands.Choice(name=label, value=value) for value, label in RULE_TYPES.items()
+])
+async def add_rule(
+    interaction: discord.Interaction,
+    rule_type: app_commands.Choice[str],
+    role1: discord.Role,
+    role2: Optional[discord.Role] = None,
+    role3: Optional[discord.Role] = None,
+    role4: Optional[discord.Role] = None,
+    role5: Optional[discord.Role] = None,
+    grant: Optional[discord.Role] = None
+):
+    """Speichert eine neue Regel und kompiliert die Regeln der Guild neu"""
+
+    # Prüfe Berechtigung
+    if not bot.has_default_permission(interaction.user):
+        await interaction.response.send_message(
+            "<:3518crossmark:1467278065729146900> Du hast keine Berechtigung für diesen Command!",
+            ephemeral=True
+        )
+        return
+
+    role_ids = []
+    for role in [role1, role2, role3, role4, role5]:
+        if role is not None and role.id not in role_ids:
+            role_ids.append(role.id)
+
+    if rule_type.value == 'exclusive':
+        if len(role_ids) < 2:
+            await interaction.response.send_message(
+                "<:3518crossmark:1467278065729146900> Eine exklusive Gruppe braucht mindestens 2 Rollen!",
+                ephemeral=True
+            )
+            return
+        rule = {'type': 'exclusive', 'roles': role_ids}
+    else:
+        if grant is None or grant.id in role_ids:
+            await interaction.response.send_message(
+                "<:3518crossmark:1467278065729146900> Bitte gib eine zu vergebende Rolle an, die nicht Teil der Bedingung ist!",
+                ephemeral=True
+            )
+            return
+        rule = {'type': rule_type.value, 'requires': role_ids, 'grant': grant.id}
+
+    guild_id = str(interaction.guild_id)
+    bot.config['role_rules'].setdefault(guild_id, []).append(rule)
+    bot.save_config()
+    bot.compile_rules(guild_id)
+
+    embed = discord.Embed(
+        title="Rollenregel erstellt!",
+        description=f"**{rule_type.name}**\n{describe_rule(interaction.guild, rule)}",
+        color=discord.Color.from_str("#647be0")
+    )
+    embed.set_footer(text=f"Regel #{len(bot.config['role_rules'][guild_id])}")
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    await bot.log_action(
+        interaction.guild,
+        "Rollenregel erstellt",
+        interaction.user,
+        f"{rule_type.name}: {len(role_ids)} Rolle(n)",
+        moderator=interaction.user,
+        roles=[r for r in [role1, role2, role3, role4, role5, grant] if r is not None]
+    )
+
+@bot.tree.command(name="remove_rule", description="Entfernt eine Rollenregel")
+@app_commands.describe(number="Nummer der Regel (siehe /list_rules)")
+async def remove_rule(interaction: discord.Interaction, number: int):
+    """Entfernt eine Regel anhand ihrer Nummer"""
+
+    # Prüfe Berechtigung
+    if not bot.has_default_permission(interaction.user):
+        await interaction.response.send_message(
+            "<:3518crossmark:1467278065729146900> Du hast keine Berechtigung für diesen Command!",
+            ephemeral=True
+        )
+        return
+
+    guild_id = str(interaction.guild_id)
+    rules = bot.config['role_rules'].get(guild_id, [])
+
+    if number < 1 or number > len(rules):
+        await interaction.response.send_message(
+            f"<:3518crossmark:1467278065729146900> Regel #{number} existiert nicht!",
+            ephemeral=True
+        )
+        return
+
+    rule = rules.pop(number - 1)
+    if not rules:
+        del bot.config['role_rules'][guild_id]
+    bot.save_config()
+    bot.compile_rules(guild_id)
+
+    embed = discord.Embed(
+        title="Rollenregel entfernt!",
+        description=describe_rule(interaction.guild, rule),
+        color=discord.Color.from_str("#ff0000")
+    )
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@bot.tree.command(name="list_rules", description="Zeigt alle Rollenregeln")
+async def list_rules(interaction: discord.Interaction):
+    """Zeigt alle Regeln der Guild"""
+    # Prüfe Berechtigung
+    if not bot.has_default_permission(interaction.user):
+        await interaction.response.send_message(
+            "<:3518crossmark:1467278065729146900> Du hast keine Berechtigung für diesen Command!",
+            ephemeral=True
+        )
+        return
+
+    guild_id = str(interaction.guild_id)
+    rules = bot.config['role_rules'].get(guild_id)
+
+    if not rules:
+        await interaction.response.send_message(
+            "<:2533warning:1467278063002845184> Keine Rollenregeln konfiguriert!",
+            ephemeral=True
+        )
+        return
+
+    embed = discord.Embed(
+        title="Rollenregeln",
+        description="\n".join(
+            f"**#{i}** {describe_rule(interaction.guild, rule)}" for i, rule in enumerate(rules[:50], start=1)
+        ),
+        color=discord.Color.from_str("#647be0"),
+        timestamp=datetime.utcnow()
+    )
+    embed.set_footer(text=f"{len(rules)} Regel(n)")
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
 @bot.tree.command(name="set_command_permission", description="Gibt einer Rolle Zugriff auf einen Command")
 @app_commands.describe(
     command_name="Der Name des Commands (z.B. give_role)",
@@ -813,9 +3170,82 @@ async def list_command_permissions(interaction: discord.Interaction):
 
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
+def describe_throttle(limits: dict) -> str:
+    """Lesbare Darstellung der effektiven Limits eines Commands"""
+    lines = [f"> {THROTTLE_SCOPES[scope]}: `{limit[0]}` Aufrufe / `{limit[1]}` s"
+             for scope, limit in limits.items()]
+    return "\n".join(lines) or "> Unbegrenzt"
+
+@bot.tree.command(name="set_throttle", description="Begrenzt, wie oft ein Command genutzt werden darf")
+@app_commands.describe(
+    command_name="Der Name des Commands (z.B. give_role) oder * für alle Commands",
+    scope="Limit pro Benutzer oder für den ganzen Server",
+    uses="Erlaubte Aufrufe im Zeitraum (0 = unbegrenzt, leer = Standard wiederherstellen)",
+    per_seconds="Zeitraum in Sekunden"
+)
+@app_commands.choices(scope=[
+    app_commands.Choice(name=label, value=value) for value, label in THROTTLE_SCOPES.items()
+])
+async def set_throttle(interaction: discord.Interaction, command_name: str, scope: app_commands.Choice[str],
+                       uses: Optional[app_commands.Range[int, 0, 1000]] = None,
+                       per_seconds: app_commands.Range[int, 1, 86400] = 60):
+    """Setzt ein eigenes Token-Bucket-Limit für einen Command dieser Guild"""
+
+    # Prüfe Berechtigung
+    if not bot.has_default_permission(interaction.user):
+        await interaction.response.send_message(
+            "<:3518crossmark:1467278065729146900> Du hast keine Berechtigung für diesen Command!",
+            ephemeral=True
+        )
+        return
+
+    command_name = command_name.strip().lstrip('/')
+    if command_name != '*' and command_name not in {c.name for c in bot.tree.get_commands()}:
+        await interaction.response.send_message(
+            f"<:3518crossmark:1467278065729146900> Unbekannter Command `/{command_name}`!",
+            ephemeral=True
+        )
+        return
+    if command_name in THROTTLE_EXEMPT:
+        await interaction.response.send_message(
+            f"<:3518crossmark:1467278065729146900> `/{command_name}` kann nicht begrenzt werden!",
+            ephemeral=True
+        )
+        return
+
+    guild_id = str(interaction.guild_id)
+    guild_throttles = bot.config['throttles'].setdefault(guild_id, {})
+    if uses is None:
+        guild_throttles.get(command_name, {}).pop(scope.value, None)
+        if not guild_throttles.get(command_name, True):
+            del guild_throttles[command_name]
+    else:
+        guild_throttles.setdefault(command_name, {})[scope.value] = [uses, per_seconds]
+    if not guild_throttles:
+        del bot.config['throttles'][guild_id]
+    bot.save_config()
+    bot.throttle.reset(guild_id, command_name)
+
+    embed = discord.Embed(
+        title="Limit gespeichert!" if uses is not None else "Standard-Limit wiederhergestellt!",
+        description=f"Aktuelle Limits für `/{command_name}`:",
+        color=discord.Color.from_str("#647be0")
+    )
+    embed.add_field(
+        name="<:4549activity:1467278075778699344> Limits",
+        value=describe_throttle(CommandThrottle.limits_for(bot.config['throttles'].get(guild_id, {}), command_name)),
+        inline=False
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
 @bot.tree.command(name="give_role", description="Vergibt eine Rolle an einen Benutzer")
-@app_commands.describe(member="Der Benutzer", role="Die Rolle")
-async def give_role(interaction: discord.Interaction, member: discord.Member, role: discord.Role):
+@app_commands.describe(
+    member="Der Benutzer",
+    role="Die Rolle",
+    duration="Dauer, z.B. 30m, 12h, 7d oder 1d12h (optional, sonst dauerhaft)"
+)
+async def give_role(interaction: discord.Interaction, member: discord.Member, role: discord.Role,
+                    duration: Optional[str] = None):
     # Prüfe Standard-Berechtigungen (Administrator oder Manage Roles)
     has_default = bot.has_default_permission(interaction.user)
 
@@ -832,12 +3262,41 @@ async def give_role(interaction: discord.Interaction, member: discord.Member, ro
             )
             return
 
+    seconds = None
+    if duration:
+        seconds = parse_duration(duration)
+        if not seconds:
+            await interaction.response.send_message(
+                "<:3518crossmark:1467278065729146900> Ungültige Dauer! Beispiele: `30m`, `12h`, `7d`, `1d12h` (maximal `365d`)",
+                ephemeral=True
+            )
+            return
+
+    # Lokale Hierarchie-Prüfung spart einen sicher scheiternden API-Aufruf
+    if not bot.filter_manageable(interaction.guild, [role]):
+        await interaction.response.send_message(
+            f"<:3518crossmark:1467278065729146900> {role.mention} liegt über der höchsten Bot-Rolle und kann nicht vergeben werden!",
+            ephemeral=True
+        )
+        return
+
     try:
         await member.add_roles(role, reason=f"Vergeben von {interaction.user.name}")
 
+        guild_id = str(interaction.guild_id)
+        description = f"{role.mention} wurde {member.mention} gegeben!"
+        if seconds:
+            expires_at = int(time.time()) + seconds
+            bot.schedule_role_expiry(guild_id, member.id, role.id, expires_at)
+            bot.save_config()
+            description += f"\nLäuft ab: <t:{expires_at}:R>"
+        elif bot.cancel_role_expiry(guild_id, member.id, role.id):
+            # Dauerhafte Vergabe hebt eine bestehende Ablaufzeit auf
+            bot.save_config()
+
         embed = discord.Embed(
             title="Rolle vergeben!",
-            description=f"{role.mention} wurde {member.mention} gegeben!",
+            description=description,
             color=discord.Color.from_str("#1eff00")
         )
 
@@ -847,7 +3306,7 @@ async def give_role(interaction: discord.Interaction, member: discord.Member, ro
             interaction.guild,
             "Rolle bekommen",
             member,
-            f"Manuell vergeben",
+            f"Manuell vergeben für {duration}" if seconds else "Manuell vergeben",
             moderator=interaction.user,
             roles=[role]
         )
@@ -876,9 +3335,20 @@ async def remove_role(interaction: discord.Interaction, member: discord.Member,
             )
             return
 
+    # Lokale Hierarchie-Prüfung spart einen sicher scheiternden API-Aufruf
+    if not bot.filter_manageable(interaction.guild, [role]):
+        await interaction.response.send_message(
+            f"<:3518crossmark:1467278065729146900> {role.mention} liegt über der höchsten Bot-Rolle und kann nicht entfernt werden!",
+            ephemeral=True
+        )
+        return
+
     try:
         await member.remove_roles(role, reason=f"Entfernt von {interaction.user.name}")
 
+        if bot.cancel_role_expiry(str(interaction.guild_id), member.id, role.id):
+            bot.save_config()
+
         embed = discord.Embed(
             title="Rolle entfernt!",
             description=f"{role.mention} wurde von {member.mention} entfernt!",
@@ -961,6 +3431,351 @@ async def role_info(interaction: discord.Interaction, role: discord.Role):
 
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
+@bot.tree.command(name="cleanup", description="Entfernt gelöschte Rollen und Kanäle aus der Konfiguration")
+async def cleanup(interaction: discord.Interaction):
+    """Sucht nach IDs gelöschter Rollen/Kanäle und entfernt sie in einem Durchgang"""
+    # Prüfe Berechtigung
+    if not bot.has_default_permission(interaction.user):
+        await interaction.response.send_message(
+            "<:3518crossmark:1467278065729146900> Du hast keine Berechtigung für diesen Command!",
+            ephemeral=True
+        )
+        return
+
+    guild_id = str(interaction.guild_id)
+    dead_roles = {rid for rid in bot.referenced_role_ids(guild_id) if interaction.guild.get_role(rid) is None}
+    removed = bot.prune_roles(guild_id, dead_roles) if dead_roles else {}
+
+    log_channel_removed = False
+    channel_id = bot.config['log_channels'].get(guild_id)
+    if channel_id is not None and interaction.guild.get_channel(channel_id) is None:
+        del bot.config['log_channels'][guild_id]
+        bot.drop_log_webhook(guild_id)
+        log_channel_removed = True
+
+    if any(removed.values()) or log_channel_removed:
+        bot.save_config()
+
+    embed = discord.Embed(
+        title="Bereinigung abgeschlossen!",
+        color=discord.Color.from_str("#647be0"),
+        timestamp=datetime.utcnow()
+    )
+    embed.add_field(
+        name="<:4549activity:1467278075778699344> Entfernt",
+        value=(f"> Gelöschte Rollen: `{len(dead_roles)}`\n"
+               f"> Verbindungseinträge: `{removed.get('connections', 0)}`\n"
+               f"> Berechtigungseinträge: `{removed.get('permissions', 0)}`\n"
+               f"> Regeln: `{removed.get('rules', 0)}`\n"
+               f"> Geplante Abläufe: `{removed.get('expiries', 0)}`\n"
+               f"> Log-Kanal: `{'entfernt' if log_channel_removed else 'ok'}`"),
+        inline=False
+    )
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+TRANSFER_SECTION_LABELS = {
+    'role_connections': "<:1198link:1467278050436710500> Rollenverbindungen",
+    'command_permissions': "<:8586slashcommand:1467278119814692934> Berechtigungen"
+}
+
+def format_import_diff(guild: discord.Guild, section: str, current: dict, target: dict,
+                       mention: bool = True) -> List[str]:
+    """Zeilen für die Import-Vorschau: + neu, ~ geändert, - entfernt"""
+    def role(role_id):
+        if mention:
+            return f"<@&{role_id}>"
+        found = guild.get_role(int(role_id))
+        return f"@{found.name} ({role_id})" if found else str(role_id)
+
+    def label(key):
+        return role(key) if section == 'role_connections' else f"/{key}"
+
+    diff = diff_sections(current, target)
+    lines = [f"+ {label(key)} → {', '.join(role(r) for r in target[key])}" for key in diff['added']]
+    for key in diff['changed']:
+        changes = ([f"+{role(r)}" for r in target[key] if r not in current[key]]
+                   + [f"-{role(r)}" for r in current[key] if r not in target[key]])
+        lines.append(f"~ {label(key)}: {' '.join(changes)}")
+    lines += [f"- {label(key)}" for key in diff['removed']]
+    return lines
+
+class ConfigImportView(discord.ui.View):
+    """Bestätigung für /import_config - der Import wird erst nach Klick übernommen"""
+
+    def __init__(self, author_id: int, guild_id: str, target: dict, snapshot: dict, summary: str):
+        super().__init__(timeout=300)
+        self.author_id = author_id
+        self.guild_id = guild_id
+        self.target = target
+        self.snapshot = snapshot
+        self.summary = summary
+        self.interaction: Optional[discord.Interaction] = None
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.author_id
+
+    async def on_timeout(self):
+        if self.interaction is not None:
+            try:
+                await self.interaction.edit_original_response(
+                    content="<:2533warning:1467278063002845184> Import-Vorschau abgelaufen, nichts wurde geändert.",
+                    view=None
+                )
+            except discord.HTTPException:
+                pass
+
+    @discord.ui.button(label="Übernehmen", style=discord.ButtonStyle.success)
+    async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.stop()
+
+        # Wurde die Konfiguration seit der Vorschau geändert, passt der Diff nicht mehr
+        current = {section: bot.config[section].get(self.guild_id, {}) for section in self.target}
+        if current != self.snapshot:
+            await interaction.response.edit_message(
+                content="<:3518crossmark:1467278065729146900> Die Konfiguration wurde seit der Vorschau geändert. "
+                        "Bitte den Import erneut starten.",
+                embed=None, attachments=[], view=None
+            )
+            return
+
+        try:
+            bot.apply_import(self.guild_id, self.target)
+        except OSError as e:
+            logger.error(f"Fehler beim Speichern des Imports: {e}")
+            await interaction.response.edit_message(
+                content="<:3518crossmark:1467278065729146900> Speichern fehlgeschlagen, nichts wurde geändert.",
+                embed=None, attachments=[], view=None
+            )
+            return
+
+        embed = discord.Embed(
+            title="Konfiguration importiert!",
+            description=self.summary,
+            color=discord.Color.from_str("#1eff00")
+        )
+        await interaction.response.edit_message(embed=embed, attachments=[], view=None)
+
+        await bot.log_action(
+            interaction.guild,
+            "Konfiguration importiert",
+            interaction.user,
+            self.summary.replace("**", ""),
+            moderator=interaction.user,
+            roles=[]
+        )
+
+    @discord.ui.button(label="Abbrechen", style=discord.ButtonStyle.secondary)
+    async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.stop()
+        await interaction.response.edit_message(
+            content="Import abgebrochen, nichts wurde geändert.",
+            embed=None, attachments=[], view=None
+        )
+
+@bot.tree.command(name="export_config", description="Exportiert Verbindungen und Berechtigungen als Datei")
+@app_commands.describe(file_type="Dateiformat (Standard: JSON)")
+@app_commands.choices(file_type=[
+    app_commands.Choice(name="JSON", value="json"),
+    app_commands.Choice(name="CSV", value="csv")
+])
+async def export_config(interaction: discord.Interaction, file_type: Optional[app_commands.Choice[str]] = None):
+    """Erstellt eine Datei, die /import_config (auch in einer anderen Guild) wieder einlesen kann"""
+    # Prüfe Berechtigung
+    if not bot.has_default_permission(interaction.user):
+        await interaction.response.send_message(
+            "<:3518crossmark:1467278065729146900> Du hast keine Berechtigung für diesen Command!",
+            ephemeral=True
+        )
+        return
+
+    guild_id = str(interaction.guild_id)
+    sections = bot.export_sections(guild_id)
+    extension = file_type.value if file_type else 'json'
+
+    if extension == 'csv':
+        content = export_sections_csv(sections)
+    else:
+        content = json_dumps({
+            'guild_id': guild_id,
+            'exported_at': datetime.utcnow().isoformat(timespec='seconds'),
+            **sections
+        }, indent=True)
+
+    embed = discord.Embed(
+        title="Konfiguration exportiert!",
+        description=(f"> Rollenverbindungen: `{len(sections['role_connections'])}`\n"
+                     f"> Command-Berechtigungen: `{len(sections['command_permissions'])}`\n\n"
+                     "Die Datei kann bearbeitet und mit `/import_config` wieder eingelesen werden."),
+        color=discord.Color.from_str("#647be0"),
+        timestamp=datetime.utcnow()
+    )
+    file = discord.File(io.BytesIO(content.encode('utf-8')), filename=f"custom_roles_{guild_id}.{extension}")
+
+    await interaction.response.send_message(embed=embed, file=file, ephemeral=True)
+
+@bot.tree.command(name="import_config", description="Importiert Verbindungen und Berechtigungen aus einer Datei")
+@app_commands.describe(
+    file="JSON- oder CSV-Datei (Format wie bei /export_config)",
+    mode="Zusammenführen (Standard) oder die Sektionen der Datei komplett ersetzen"
+)
+@app_commands.choices(mode=[
+    app_commands.Choice(name="Zusammenführen", value="merge"),
+    app_commands.Choice(name="Ersetzen", value="replace")
+])
+async def import_config(interaction: discord.Interaction, file: discord.Attachment,
+                        mode: Optional[app_commands.Choice[str]] = None):
+    """Prüft die Datei in einem Durchgang, zeigt den Diff und übernimmt ihn nach Bestätigung mit einem Speichervorgang"""
+    # Prüfe Berechtigung
+    if not bot.has_default_permission(interaction.user):
+        await interaction.response.send_message(
+            "<:3518crossmark:1467278065729146900> Du hast keine Berechtigung für diesen Command!",
+            ephemeral=True
+        )
+        return
+
+    if file.size > 1024 * 1024:
+        await interaction.response.send_message(
+            "<:3518crossmark:1467278065729146900> Die Datei ist zu groß (maximal 1 MB)!",
+            ephemeral=True
+        )
+        return
+
+    try:
+        sections = parse_config_import(file.filename, await file.read())
+    except ValueError as e:
+        await interaction.response.send_message(f"<:3518crossmark:1467278065729146900> {e}", ephemeral=True)
+        return
+
+    errors, warnings = bot.validate_import(interaction.guild, sections)
+    if errors:
+        embed = discord.Embed(
+            title="Import abgelehnt",
+            description="Die Datei wurde nicht übernommen:\n" + join_limited([f"> {e}" for e in errors], "\n", 3800),
+            color=discord.Color.from_str("#ff0000")
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+
+    guild_id = str(interaction.guild_id)
+    replace = mode is not None and mode.value == 'replace'
+    target = bot.build_import(guild_id, sections, replace)
+    snapshot = {section: {k: list(v) for k, v in bot.config[section].get(guild_id, {}).items()}
+                for section in target}
+
+    embed = discord.Embed(
+        title="Import-Vorschau",
+        description=f"Modus: **{'Ersetzen' if replace else 'Zusammenführen'}** • Datei: `{file.filename}`",
+        color=discord.Color.from_str("#647be0")
+    )
+    summary = []
+    full_diff = []
+    truncated = False
+    for section, entries in target.items():
+        lines = format_import_diff(interaction.guild, section, snapshot[section], entries)
+        if not lines:
+            continue
+        diff = diff_sections(snapshot[section], entries)
+        counts = f"+{len(diff['added'])} / ~{len(diff['changed'])} / -{len(diff['removed'])}"
+        summary.append(f"**{TRANSFER_SECTION_LABELS[section]}:** {counts}")
+        value = join_limited(lines, "\n", 1000)
+        truncated = truncated or value != "\n".join(lines)
+        embed.add_field(name=f"{TRANSFER_SECTION_LABELS[section]} ({counts})", value=value, inline=False)
+        full_diff.append(f"[{section}]")
+        full_diff += format_import_diff(interaction.guild, section, snapshot[section], entries, mention=False)
+
+    if not summary:
+        await interaction.response.send_message(
+            "<:2533warning:1467278063002845184> Keine Änderungen - die Datei entspricht der aktuellen Konfiguration.",
+            ephemeral=True
+        )
+        return
+
+    manageable = bot.manageable_role_ids(interaction.guild)
+    unmanageable = {role_id for child_ids in target.get('role_connections', {}).values()
+                    for role_id in child_ids if role_id not in manageable}
+    if unmanageable:
+        embed.add_field(
+            name="<:2533warning:1467278063002845184> Warnung",
+            value=f"{len(unmanageable)} Child-Rolle(n) liegen über der höchsten Bot-Rolle und werden übersprungen.",
+            inline=False
+        )
+    if warnings:
+        embed.add_field(
+            name="<:2533warning:1467278063002845184> Hinweise",
+            value=join_limited([f"> {w}" for w in warnings], "\n", 1000),
+            inline=False
+        )
+    embed.set_footer(text="Nichts wird geändert, bis du auf „Übernehmen“ klickst.")
+
+    view = ConfigImportView(interaction.user.id, guild_id, target, snapshot, "\n".join(summary))
+    kwargs = {}
+    if truncated:
+        # Vollständiger Diff als Datei, wenn er nicht ins Embed passt
+        kwargs['file'] = discord.File(io.BytesIO("\n".join(full_diff).encode('utf-8')), filename="import_diff.txt")
+    await interaction.response.send_message(embed=embed, view=view, ephemeral=True, **kwargs)
+    view.interaction = interaction
+
+@bot.tree.command(name="history", description="Zeigt den Rollenverlauf eines Mitglieds oder einer Rolle")
+@app_commands.describe(
+    member="Der Benutzer (optional)",
+    role="Die Rolle (optional)",
+    page="Seite (10 Einträge pro Seite)"
+)
+async def history(interaction: discord.Interaction, member: Optional[discord.Member] = None,
+                  role: Optional[discord.Role] = None, page: int = 1):
+    """Durchsucht den gespeicherten Verlauf über die Indizes nach Mitglied/Rolle/Zeit"""
+    # Prüfe Berechtigung
+    if not bot.has_default_permission(interaction.user):
+        await interaction.response.send_message(
+            "<:3518crossmark:1467278065729146900> Du hast keine Berechtigung für diesen Command!",
+            ephemeral=True
+        )
+        return
+
+    page_size = 10
+    page = max(page, 1)
+    rows, total = await bot.history.query(
+        interaction.guild_id,
+        member_id=member.id if member else None,
+        role_id=role.id if role else None,
+        limit=page_size,
+        offset=(page - 1) * page_size
+    )
+
+    if total == 0:
+        await interaction.response.send_message(
+            "<:2533warning:1467278063002845184> Keine Einträge im Verlauf gefunden!",
+            ephemeral=True
+        )
+        return
+
+    lines = []
+    for member_id, role_id, action, moderator_id, ts, details in rows:
+        line = f"<t:{int(ts)}:f> **{action}** <@{member_id}>"
+        if role_id:
+            line += f" <@&{role_id}>"
+        if moderator_id:
+            line += f" (von <@{moderator_id}>)"
+        lines.append(line)
+
+    filters = []
+    if member:
+        filters.append(member.mention)
+    if role:
+        filters.append(role.mention)
+
+    embed = discord.Embed(
+        title="Rollenverlauf",
+        description=(f"Filter: {', '.join(filters)}\n\n" if filters else "") + "\n".join(lines),
+        color=discord.Color.from_str("#647be0"),
+        timestamp=datetime.utcnow()
+    )
+    pages = (total + page_size - 1) // page_size
+    embed.set_footer(text=f"Seite {min(page, pages)}/{pages} • {total} Einträge")
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
 @bot.tree.command(name="help", description="Zeigt alle Commands")
 async def help_command(interaction: discord.Interaction):
     # Prüfe Berechtigung
@@ -981,22 +3796,32 @@ async def help_command(interaction: discord.Interaction):
     commands_info = {
         "<:1041searchthreads:1467278040915771596> Konfiguration": [
             "`/config` - Zeigt die komplette Konfiguration",
-            "`/set_log_channel` - Setzt den Log-Channel"
+            "`/set_log_channel` - Setzt den Log-Channel",
+            "`/cleanup` - Entfernt gelöschte Rollen und Kanäle",
+            "`/export_config` - Exportiert Verbindungen und Berechtigungen",
+            "`/import_config` - Importiert eine Datei mit Vorschau"
         ],
         "<:1198link:1467278050436710500> Rollenverbindungen": [
-            "`/connect_roles` - Verbindet bis zu 15 Rollen",
+            "`/connect_roles` - Verbindet beliebig viele Rollen",
             "`/disconnect_roles` - Entfernt Verbindungen",
             "`/list_connections` - Zeigt alle Verbindungen"
         ],
+        "<:1198link:1467278050436710500> Rollenregeln": [
+            "`/add_rule` - Erstellt eine UND-, ODER- oder exklusive Regel",
+            "`/remove_rule` - Entfernt eine Regel",
+            "`/list_rules` - Zeigt alle Regeln"
+        ],
         "<:8586slashcommand:1467278119814692934> Berechtigungen": [
             "`/set_command_permission` - Gibt Rolle Command-Zugriff",
             "`/remove_command_permission` - Entfernt Command-Zugriff",
-            "`/list_command_permissions` - Zeigt alle Berechtigungen"
+            "`/list_command_permissions` - Zeigt alle Berechtigungen",
+            "`/set_throttle` - Begrenzt, wie oft ein Command genutzt werden darf"
         ],
         "<:4748ticket:1467278078672633967> Rollenverwaltung": [
-            "`/give_role` - Vergibt eine Rolle",
+            "`/give_role` - Vergibt eine Rolle (optional zeitlich begrenzt)",
             "`/remove_role` - Entfernt eine Rolle",
-            "`/role_info` - Zeigt Rollendetails"
+            "`/role_info` - Zeigt Rollendetails",
+            "`/history` - Zeigt den Rollenverlauf"
         ]
     }
     embed.set_image(url="https://media.discordapp.net/attachments/1451317020418117724/1467292284323369093/image.png?ex=697fd9ed&is=697e886d&hm=82f7142fc2c87850ca4cbca9debc4497fc6a37edf21276baee43caf09f1aac7b&=&format=webp&quality=lossless&width=1128&height=255")
@@ -1016,8 +3841,6 @@ async def help_command(interaction: discord.Interaction):
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 if __name__ == "__main__":
-    import sys
-
     token = os.getenv('DISCORD_TOKEN')
 
     if not token:
@@ -1031,7 +3854,12 @@ if __name__ == "__main__":
 
     try:
         print("🚀 Starte Bot...")
-        keep_alive()  # <-- DIESE ZEILE HINZUFÜGEN
+        with startup_timer.phase('keep_alive'):
+            keep_alive()  # <-- DIESE ZEILE HINZUFÜGEN
+        if PERFORMANCE_PROFILE and not install_uvloop():
+            logger.warning("Performance-Profil: uvloop nicht installiert, nutze Standard-Event-Loop")
+        logger.info(f"Performance-Status: {performance_status()}")
+        startup_timer.begin('login')
         bot.run(token)
     except Exception as e:
         logger.error(f"❌ Fehler: {e}")